@@ -0,0 +1,283 @@
+"""Processing steps of the Streamlit app: cached parse, allocation and output builds.
+
+Imported when the first file is uploaded, so the landing page renders
+without loading openpyxl (via engine) or requests (via template_cache).
+Being a module, its functions are also defined once per process instead
+of on every rerun of app.py.
+"""
+import streamlit as st # Import streamlit
+import hashlib # Import hashlib to key cached results by file content
+import io # Import io to handle byte streams
+import os # Import os module for file names
+import shutil # Import shutil to remove finished multi-file work directories
+import tempfile # Import tempfile for multi-file work directories
+import time # Import time to report re-allocation time after edits
+import zipfile # Import zipfile to bundle multi-file outputs
+from urllib.parse import quote # Import quote for the URL of a served ZIP
+
+import batch # Worker pool over many input files
+
+import diagnostics # Optional per-phase timing and memory reports
+import engine # Headless allocation engine (parsing, allocation, rendering)
+import scenarios # What-if runs over capacities and orderings
+import template_cache # Disk + in-memory template cache with offline fallback
+
+RESULT_CACHE_ENTRIES = 32 # Number of processed uploads kept across reruns
+WORK_DIR_PREFIX = "manmonths-" # Multi-file work directories (system temp dir or STATIC_DIR)
+WORK_DIR_MAX_AGE = 24 * 3600 # Seconds before a work directory left by an ended session is removed
+ZIP_NAME = "ΚΑΤΑΝΟΜΗ ΑΜ.zip"
+# Streamlit serves this folder at app/static/ when server.enableStaticServing is on,
+# straight from disk; files larger than STATIC_MAX_BYTES are not served
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+STATIC_URL = "app/static/"
+STATIC_MAX_BYTES = 200 * 2**20
+
+@st.cache_data(max_entries=RESULT_CACHE_ENTRIES, show_spinner=False)
+def parse_upload(file_hash, _file_bytes, with_diagnostics=False):
+    # Cached on every argument except _file_bytes, which is excluded from hashing.
+    # Reruns and re-uploads of an unchanged file reuse the parsed rows.
+    report = diagnostics.new_report(with_diagnostics, file_hash=file_hash[:12])
+    try:
+        # openpyxl needs a seekable file-like object; read-only keeps large CVs streaming
+        with diagnostics.phase(report, "load", bytes=len(_file_bytes)):
+            wb_in = engine.open_input(io.BytesIO(_file_bytes), read_only=True)
+        try:
+            with diagnostics.phase(report, "parse") as counts:
+                rows = engine.input_rows(wb_in.active) # Kept for the edit grid
+                data, years, parse_errors = engine.project_rows(rows)
+                counts.update(projects=len(data), parse_errors=len(parse_errors))
+        finally:
+            wb_in.close() # Release the read-only workbook's buffer
+    finally:
+        diagnostics.finish(report) # Also when the upload cannot be read
+
+    return {"rows": rows, "data": data, "years": years, "parse_errors": parse_errors, "diagnostics": report}
+
+@st.cache_data(max_entries=RESULT_CACHE_ENTRIES, show_spinner=False)
+def parse_edited(file_hash, edits, _parsed):
+    # The upload's rows with the grid edits applied, parsed like an uploaded file
+    rows = apply_row_edits(_parsed["rows"], dict(edits))
+    data, years, parse_errors = engine.project_rows(rows)
+    return {"rows": rows, "data": data, "years": years, "parse_errors": parse_errors, "diagnostics": None}
+
+@st.cache_data(max_entries=RESULT_CACHE_ENTRIES, show_spinner=False)
+def run_allocation(file_hash, mode, capacity, ordering, _parsed, with_diagnostics=False, edits=()):
+    # _parsed is this file's parse_upload (or, with edits, parse_edited) result;
+    # allocate() sorts the rows and writes into them, so it works on copies
+    # (scenarios reuse the same rows)
+    report = diagnostics.new_report(with_diagnostics, file_hash=file_hash[:12], mode=mode)
+    data, years = [dict(project_data) for project_data in _parsed["data"]], _parsed["years"]
+    try:
+        with diagnostics.phase(report, "allocation", projects=len(data), years=len(years)):
+            allocation = engine.allocate(data, years, capacity, mode, ordering)
+    finally:
+        diagnostics.finish(report)
+    return {"data": data, "allocation": allocation, "diagnostics": report}
+
+@st.cache_data(max_entries=RESULT_CACHE_ENTRIES, show_spinner=False)
+def build_output(file_hash, template_version, mode, capacity, ordering, _file_bytes, _years, _allocated, edits=(),
+                 with_diagnostics=False):
+    # The XLSX is only built when a download is requested; the allocation it
+    # renders (_allocated) is fully determined by the hashed arguments
+    report = diagnostics.new_report(with_diagnostics, file_hash=file_hash[:12], mode=mode)
+    data = _allocated["data"]
+
+    try:
+        # Needed for the CV sheet; edited rows are written into it first
+        wb_in = engine.open_input(io.BytesIO(_file_bytes), read_only=not edits)
+        try:
+            if edits:
+                engine.edit_input_sheet(wb_in.active, dict(edits))
+            with diagnostics.phase(report, "template"):
+                template_wb, _ = template_cache.get_template()
+            # Large inputs are rendered with the write-only (streaming) renderer
+            with diagnostics.phase(report, "render", grid_cells=len(data) * len(_years) * 12):
+                wb = engine.render(template_wb, wb_in.active, data, _years, _allocated["allocation"])
+
+            output_buffer = io.BytesIO()
+            with diagnostics.phase(report, "save") as counts:
+                wb.save(output_buffer)
+                counts["bytes"] = output_buffer.tell()
+        finally:
+            wb_in.close()
+    finally:
+        diagnostics.finish(report)
+    return output_buffer.getvalue(), report
+
+def output_builder(file_hash, mode, capacity, ordering, file_bytes, years, allocated, edits=(), with_diagnostics=False):
+    # Zero-argument callable for st.download_button: runs only on click, after
+    # the template check (which may hit the network) that keys the cache.
+    # It runs outside the script thread, where st.session_state is not
+    # available, so its phases go into a dict fetched from the session here;
+    # the diagnostics panel shows them on a later rerun.
+    workbook_phases = st.session_state.setdefault("workbook_diagnostics", {})
+    def build():
+        fetch_report = diagnostics.new_report(with_diagnostics, track_memory=False, file_hash=file_hash[:12])
+        try:
+            with diagnostics.phase(fetch_report, "template_fetch"):
+                template_version = template_cache.template_version()
+        finally:
+            diagnostics.finish(fetch_report)
+        workbook, report = build_output(file_hash, template_version, mode, capacity, ordering,
+                                        file_bytes, years, allocated, edits, with_diagnostics)
+        if fetch_report and report:
+            workbook_phases[file_hash] = fetch_report["phases"] + report["phases"]
+        return workbook
+    return build
+
+@st.cache_data(max_entries=RESULT_CACHE_ENTRIES, show_spinner=False)
+def run_what_if(file_hash, capacities, orderings, mode, _parsed, edits=()):
+    # Run every (capacity, ordering) scenario on the worker pool over the parsed rows
+    return scenarios.run_scenarios(_parsed["data"], _parsed["years"], capacities, orderings, mode)
+
+def period_text(period):
+    # Period as shown in the edit grid; date cells cover their month
+    if hasattr(period, "year"):
+        return f"{period.month:02d}/{period.year}"
+    return str(period)
+
+def editor_rows(parsed):
+    errors = {error["row"]: error["error"] for error in parsed["parse_errors"]}
+    return [{"Row": r, engine.PERIOD_HEADER: period_text(period), engine.AM_HEADER: am, "Status": errors.get(r, "OK")}
+            for r, period, am in parsed["rows"]]
+
+def row_changes(parsed, edited_rows):
+    # {row: (period, am)} for the grid rows that differ from the upload; an
+    # unchanged period keeps its original cell value (e.g. a date)
+    changes = {}
+    for (r, period, am), edited in zip(parsed["rows"], edited_rows):
+        text, new_am = edited[engine.PERIOD_HEADER], edited[engine.AM_HEADER]
+        if text != period_text(period) or new_am != am:
+            changes[r] = (period if text == period_text(period) else text, engine.parse_am(new_am))
+    return changes
+
+def apply_row_edits(rows, changes):
+    # Candidate rows with the edits applied; rows left without a period or AMs drop out
+    edited = {r: (period, am) for r, period, am in rows}
+    edited.update(changes)
+    return [(r, period, am) for r, (period, am) in sorted(edited.items()) if period and am != 0]
+
+def edited_allocation(file_hash, parsed, changes):
+    # Greedy allocation of the edited rows. The allocation state lives in the
+    # session, so each edit only recomputes the projects and years it affects.
+    key = (file_hash, engine.MAX_YEARLY_CAPACITY, engine.SHORTEST_FIRST)
+    session = st.session_state.get("row_edits")
+    if session is None or session["key"] != key:
+        state = engine.new_allocation_state(parsed["rows"], engine.MAX_YEARLY_CAPACITY, engine.SHORTEST_FIRST)
+        session = st.session_state["row_edits"] = {"key": key, "state": state, "applied": {}, "last_edit": None}
+
+    # Only what changed since the previous rerun; reverted rows go back to the upload's values
+    originals = {r: (period, am) for r, period, am in parsed["rows"]}
+    applied = session["applied"]
+    delta = {r: changes.get(r, originals[r]) for r in set(changes) | set(applied) if changes.get(r) != applied.get(r)}
+    if delta:
+        start = time.perf_counter()
+        recomputed = engine.edit_rows(session["state"], delta)
+        session["last_edit"] = (len(delta), recomputed, time.perf_counter() - start)
+        session["applied"] = dict(changes)
+
+    data, years, allocation, parse_errors = engine.allocation_result(session["state"])
+    return {"data": data, "years": years, "allocation": allocation, "parse_errors": parse_errors,
+            "diagnostics": None, "last_edit": session["last_edit"]}
+
+def static_serving():
+    return st.get_option("server.enableStaticServing")
+
+def sweep_work_dirs(max_age=WORK_DIR_MAX_AGE):
+    # Sessions that end (tab closed, server stopped) never remove their work
+    # directory, so old ones are removed when the next batch starts
+    cutoff = time.time() - max_age
+    for parent in (tempfile.gettempdir(), STATIC_DIR):
+        try:
+            names = os.listdir(parent)
+        except OSError: # No static folder
+            continue
+        for name in names:
+            path = os.path.join(parent, name)
+            try:
+                if name.startswith(WORK_DIR_PREFIX) and os.path.isdir(path) and os.path.getmtime(path) < cutoff:
+                    shutil.rmtree(path, ignore_errors=True)
+            except OSError: # Removed meanwhile by another process
+                pass
+
+def process_uploads(input_files, mode):
+    # Process many uploads on the worker pool; outputs go into one ZIP on disk
+    # as each file finishes, so only one output is ever held at a time. With
+    # static serving on, the work directory (randomly named) is created in
+    # STATIC_DIR so the ZIP can be downloaded from disk (see zip_url)
+    file_hashes = tuple(hashlib.sha256(f.getvalue()).hexdigest() for f in input_files)
+    template_snapshot, template_version = template_cache.template_snapshot()
+    batch_key = (file_hashes, tuple(f.name for f in input_files), mode, template_version)
+
+    state = st.session_state.get("multi_upload")
+    if state is not None and state["key"] == batch_key and os.path.exists(state["zip_path"]):
+        st.dataframe(state["rows"], hide_index=True)
+        return state["zip_path"]
+    if state is not None:
+        shutil.rmtree(state["work_dir"], ignore_errors=True) # Outputs of the previous set of uploads
+    sweep_work_dirs()
+
+    if static_serving():
+        os.makedirs(STATIC_DIR, exist_ok=True)
+    work_dir = tempfile.mkdtemp(prefix=WORK_DIR_PREFIX, dir=STATIC_DIR if static_serving() else None)
+    jobs = []
+    rows = {}
+    for i, uploaded in enumerate(input_files):
+        # One directory per upload, so files with the same name do not collide
+        input_path = os.path.join(work_dir, "in", str(i), os.path.basename(uploaded.name))
+        output_dir = os.path.join(work_dir, "out", str(i))
+        os.makedirs(os.path.dirname(input_path))
+        os.makedirs(output_dir)
+        with open(input_path, "wb") as f:
+            f.write(uploaded.getvalue())
+        jobs.append((input_path, output_dir))
+        rows[input_path] = {"File": uploaded.name, "Status": "Σε αναμονή (Queued)", "Projects": None,
+                            "Allocated AM": None, "Unallocated AM": None, "Skipped rows": None}
+
+    status_table = st.empty()
+    status_table.dataframe(list(rows.values()), hide_index=True)
+
+    zip_path = os.path.join(work_dir, ZIP_NAME)
+    zip_names = set()
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_STORED) as archive: # XLSX files are already compressed
+        for input_path, summary, error in batch.process_files(jobs, template_snapshot, engine.MAX_YEARLY_CAPACITY,
+                                                              mode=mode, max_workers=min(len(jobs), os.cpu_count() or 1)):
+            row = rows[input_path]
+            if error is not None:
+                row["Status"] = f"Σφάλμα (Failed): {error}"
+            else:
+                name = os.path.basename(summary["output"])
+                base_name, extension = os.path.splitext(name)
+                copy_number = 1
+                while name in zip_names: # Same upload name twice
+                    copy_number += 1
+                    name = f"{base_name} ({copy_number}){extension}"
+                zip_names.add(name)
+                archive.write(summary["output"], name)
+                os.remove(summary["output"])
+                row.update({"Status": "OK", "Projects": summary["projects"], "Allocated AM": summary["allocated_am"],
+                            "Unallocated AM": summary["unallocated_am"], "Skipped rows": len(summary["parse_errors"])})
+            status_table.dataframe(list(rows.values()), hide_index=True)
+
+    shutil.rmtree(os.path.join(work_dir, "in"), ignore_errors=True)
+    st.session_state["multi_upload"] = {"key": batch_key, "rows": list(rows.values()),
+                                        "work_dir": work_dir, "zip_path": zip_path}
+    return zip_path
+
+def zip_url(zip_path):
+    # URL of a ZIP that Streamlit serves from disk, or None when it cannot
+    # (static serving off, or the ZIP is over Streamlit's size limit)
+    if not static_serving() or os.path.dirname(os.path.dirname(zip_path)) != STATIC_DIR:
+        return None
+    if os.path.getsize(zip_path) > STATIC_MAX_BYTES:
+        return None
+    return STATIC_URL + quote(os.path.relpath(zip_path, STATIC_DIR).replace(os.sep, "/"))
+
+def read_file(path):
+    # Zero-argument reader for st.download_button, called only on click.
+    # st.download_button needs the bytes, so the whole file is read into
+    # memory for the download; zip_url avoids this where it can.
+    def read():
+        with open(path, "rb") as f:
+            return f.read()
+    return read
@@ -0,0 +1,102 @@
+import argparse
+import glob
+import os # Import os module for path handling
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import engine
+
+# Template snapshot shared with each worker process once, through the pool initializer
+_worker_template = {}
+
+
+def _init_worker(template_snapshot):
+    _worker_template["snapshot"] = template_snapshot
+
+
+def _process_in_worker(input_path, output_dir, capacity, streaming, mode, with_diagnostics):
+    # Every file renders into its own clone of the shared, already cleared template
+    template_wb = engine.clone_template(_worker_template["snapshot"])
+    return engine.process_file(input_path, output_dir, template_wb, capacity, streaming, mode, with_diagnostics)
+
+
+def process_files(jobs, template_snapshot, capacity=engine.MAX_YEARLY_CAPACITY, streaming=None, mode=engine.GREEDY,
+                  max_workers=None, with_diagnostics=None):
+    """Process (input_path, output_dir) jobs concurrently; yield results as they finish.
+
+    ``template_snapshot`` (see engine.snapshot_template) is sent to each
+    worker once. Yields (input_path, summary, error) tuples in completion
+    order, where exactly one of summary (see engine.process_file) and error
+    is None.
+    """
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(template_snapshot,)) as pool:
+        futures = {pool.submit(_process_in_worker, input_path, output_dir, capacity, streaming, mode, with_diagnostics): input_path
+                   for input_path, output_dir in jobs}
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result(), None
+            except Exception as e:
+                yield futures[future], None, e
+
+
+def collect_inputs(patterns):
+    # Expand directories and glob patterns into a sorted list of input workbooks
+    paths = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, "*.xlsx")
+        for path in glob.glob(pattern):
+            name = os.path.basename(path)
+            # Skip Excel lock files and outputs of previous runs
+            if name.startswith("~$") or name.endswith(engine.OUTPUT_SUFFIX):
+                continue
+            paths.add(path)
+    return sorted(paths)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch person-months allocation over many input CVs.")
+    parser.add_argument("inputs", nargs="+", help="Input .xlsx files, directories or glob patterns")
+    parser.add_argument("-o", "--output-dir", default=None, help="Directory for the output workbooks (default: next to each input)")
+    parser.add_argument("-t", "--template", default=engine.TEMPLATE_PATH, help="Template workbook (default: bundled 'AM TEST 1.xlsx')")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="Number of worker processes (default: CPU count)")
+    parser.add_argument("--capacity", type=int, default=engine.MAX_YEARLY_CAPACITY, help="Maximum person-months per year")
+    parser.add_argument("--mode", choices=engine.ALLOCATION_MODES, default=engine.GREEDY, help="Allocation mode")
+    parser.add_argument("--renderer", choices=["auto", "streaming", "template"], default="auto",
+                        help=f"Output renderer (default: streaming from {engine.STREAMING_ROW_THRESHOLD} projects)")
+    parser.add_argument("--diagnostics", action="store_true", default=None,
+                        help="Log per-phase time and memory as JSON lines on stderr (also: AM_DIAGNOSTICS=1)")
+    args = parser.parse_args(argv)
+
+    input_paths = collect_inputs(args.inputs)
+    if not input_paths:
+        print("No input .xlsx files found.", file=sys.stderr)
+        return 1
+
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    streaming = {"auto": None, "streaming": True, "template": False}[args.renderer]
+
+    jobs = [(path, args.output_dir or os.path.dirname(os.path.abspath(path))) for path in input_paths]
+    template_snapshot = engine.snapshot_template(args.template)
+
+    failures = 0
+    for path, summary, error in process_files(jobs, template_snapshot, args.capacity, streaming, args.mode,
+                                              args.workers, args.diagnostics):
+        if error is not None:
+            failures += 1
+            print(f"FAILED {path}: {error}", file=sys.stderr)
+            continue
+        for parse_error in summary["parse_errors"]:
+            print(f"  {path}: {engine.format_parse_error(parse_error)}", file=sys.stderr)
+        print(f"OK {path} -> {summary['output']} "
+              f"(projects: {summary['projects']}, allocated AM: {summary['allocated_am']}, "
+              f"unallocated AM: {summary['unallocated_am']})")
+
+    print(f"Processed {len(input_paths) - failures}/{len(input_paths)} files.")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
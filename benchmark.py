@@ -0,0 +1,256 @@
+"""Headless benchmarks of every pipeline phase on synthetic CVs.
+
+Runs without Streamlit or the network. Each case generates its input
+once; each phase is then timed separately and the median over the
+repeats is reported. ``--save-baseline`` records the results and later
+runs compare against them, failing when a phase gets slower than the
+tolerance allows.
+
+Baseline timings are only meaningful on the machine that recorded them.
+Every run also times a fixed calibration workload, and the baseline is
+scaled by how much slower or faster that ran than when the baseline was
+saved; this absorbs an overall CPU speed difference, not differences in
+disks, caches or library versions, so re-record the baseline
+(``--save-baseline``) on the machine that runs the comparison.
+Baselines are kept per case, allocation mode and renderer, so e.g. a
+``--mode max-flow`` run is only compared with (and only replaces) a
+max-flow baseline.
+
+The "startup" case times the app's landing page instead: each repeat is
+a fresh interpreter (a cold container) running app.py headless with
+Streamlit's AppTest, and fails if the landing page imports any of
+HEAVY_MODULES.
+"""
+import argparse
+import io # Import io to handle byte streams
+import json
+import os # Import os module for path handling
+import statistics
+import subprocess # Import subprocess to time the app's start-up in fresh interpreters
+import sys
+import time
+
+import openpyxl
+
+import engine
+import synthetic_cv
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+APP_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+MIN_COMPARED_SECONDS = 0.01 # Phases faster than this in the baseline are too noisy to compare
+PHASES = ("load", "parse", "template_load", "template_clear", "allocation", "render", "save")
+STARTUP_CASE = "startup"
+CALIBRATION_KEY = "calibration" # Baseline entry holding the calibration workload's seconds
+UNGATED_PHASES = ("streamlit_import",) # Reported but never a regression: not this repo's code
+HEAVY_MODULES = ("openpyxl", "requests", "dateutil") # Only needed once a file is uploaded
+
+# Runs in a fresh interpreter: time Streamlit's own import, then the first
+# (landing page) run of app.py, and list the heavy modules that run loaded
+STARTUP_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+imported = time.perf_counter()
+already_loaded = set(sys.modules)
+at = AppTest.from_file(sys.argv[1], default_timeout=60)
+at.run()
+painted = time.perf_counter()
+print(json.dumps({
+    "streamlit_import": imported - start,
+    "first_paint": painted - imported,
+    "loaded": [m for m in sys.argv[2:] if m in sys.modules and m not in already_loaded],
+    "errors": [str(e.value) for e in at.exception],
+}))
+"""
+
+# --- Benchmark cases: keyword arguments for synthetic_cv.generate_rows ---
+CASES = {
+    "small": {"rows": 50},
+    "medium": {"rows": 500},
+    "large": {"rows": 2000, "first_year": 2005},
+    "dense-overlap": {"rows": 500, "overlap": 0.95},
+    "long-spans": {"rows": 500, "min_span": 60, "max_span": 240},
+    "mixed-formats": {"rows": 500, "format_mix": dict.fromkeys(synthetic_cv.DATE_FORMATS, 1)},
+}
+
+
+def run_case(params, repeat=3, mode=engine.GREEDY, streaming=None, template_path=engine.TEMPLATE_PATH):
+    """Time each phase of the pipeline on one synthetic input.
+
+    Returns {"rows", "projects", "years", "phases": {phase: median seconds}}.
+    """
+    input_buffer = io.BytesIO()
+    synthetic_cv.write_workbook(input_buffer, synthetic_cv.generate_rows(**params))
+    input_bytes = input_buffer.getvalue()
+
+    timings = {phase: [] for phase in PHASES}
+
+    def timed(phase, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        timings[phase].append(time.perf_counter() - start)
+        return result
+
+    for _ in range(repeat):
+        wb_in = timed("load", engine.open_input, io.BytesIO(input_bytes), True)
+        try:
+            ws_in = wb_in.active
+            data, years, parse_errors = timed("parse", engine.read_input, ws_in)
+            # Uncached template parse and clear, as on a cold start
+            template_wb = timed("template_load", openpyxl.load_workbook, template_path)
+            timed("template_clear", engine.reset_template, template_wb.active)
+            allocation = timed("allocation", engine.allocate, data, years, engine.MAX_YEARLY_CAPACITY, mode)
+            wb = timed("render", engine.render, template_wb, ws_in, data, years, allocation, streaming)
+            timed("save", wb.save, io.BytesIO())
+        finally:
+            wb_in.close() # Release the file handle held by the read-only workbook
+
+    return {
+        "rows": params["rows"],
+        "projects": len(data),
+        "years": len(years),
+        "phases": {phase: statistics.median(times) for phase, times in timings.items()},
+    }
+
+
+def run_startup(repeat=3, app_file=APP_FILE):
+    """Time the app's landing page in ``repeat`` fresh interpreters.
+
+    Returns {"phases": {"streamlit_import", "first_paint": median seconds},
+    "heavy_modules": modules from HEAVY_MODULES the landing page imported}.
+    """
+    timings = {"streamlit_import": [], "first_paint": []}
+    heavy_modules = set()
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", STARTUP_PROBE, app_file, *HEAVY_MODULES],
+                                capture_output=True, text=True, check=True).stdout
+        probe = json.loads(output.strip().splitlines()[-1])
+        if probe["errors"]:
+            raise RuntimeError(f"app.py failed on start-up: {probe['errors']}")
+        for phase in timings:
+            timings[phase].append(probe[phase])
+        heavy_modules.update(probe["loaded"])
+    return {
+        "phases": {phase: statistics.median(times) for phase, times in timings.items()},
+        "heavy_modules": sorted(heavy_modules),
+    }
+
+
+def baseline_key(case, mode, renderer):
+    # The startup case runs neither the allocation nor a renderer
+    return case if case == STARTUP_CASE else f"{case}/{mode}/{renderer}"
+
+
+def calibrate(repeat=5):
+    """Median seconds of a fixed pure-Python workload (sorting, dicts, strings).
+
+    Its ratio between two runs estimates how much faster one machine (or
+    moment) is than the other, and scales the baseline accordingly.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        counts = {}
+        for i in range(200_000):
+            key = f"{i % 997:03d}-{i % 12}"
+            counts[key] = counts.get(key, 0) + i
+        sorted(counts.items(), key=lambda item: (item[1], item[0]))
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def compare(results, baseline, tolerance, scale=1.0):
+    # Return "case/phase" entries slower than tolerance x baseline; scale is
+    # this run's calibration time over the baseline's
+    regressions = []
+    for case, result in results.items():
+        for phase, seconds in result["phases"].items():
+            reference = baseline.get(case, {}).get("phases", {}).get(phase)
+            if phase in UNGATED_PHASES or not reference or reference < MIN_COMPARED_SECONDS:
+                continue
+            if seconds > reference * scale * tolerance:
+                regressions.append(f"{case}/{phase}: {seconds:.3f}s vs baseline {reference:.3f}s "
+                                   f"({reference * scale:.3f}s scaled to this machine)")
+        if result.get("heavy_modules"):
+            regressions.append(f"{case}: landing page imports {', '.join(result['heavy_modules'])}")
+    return regressions
+
+
+def print_table(results, baseline, scale=1.0):
+    # Ratios are against the scaled baseline, as compared
+    print(f"{'case':<15}{'phase':<16}{'seconds':>10}{'baseline':>10}{'ratio':>8}")
+    for case, result in results.items():
+        for phase, seconds in result["phases"].items():
+            reference = baseline.get(case, {}).get("phases", {}).get(phase)
+            ratio = f"{seconds / (reference * scale):.2f}" if reference else "-"
+            reference = f"{reference:.3f}" if reference else "-"
+            print(f"{case:<15}{phase:<16}{seconds:>10.3f}{reference:>10}{ratio:>8}")
+        if case == STARTUP_CASE:
+            print(f"{case:<15}{'(heavy imports)':<26}{', '.join(result['heavy_modules']) or 'none'}")
+        else:
+            print(f"{case:<15}{'(rows/projects/years)':<26}{result['rows']}/{result['projects']}/{result['years']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every pipeline phase on synthetic CVs.")
+    parser.add_argument("cases", nargs="*", help=f"Cases to run (default: all of {', '.join([*CASES, STARTUP_CASE])})")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="Runs per case; the median is reported")
+    parser.add_argument("--mode", choices=engine.ALLOCATION_MODES, default=engine.GREEDY, help="Allocation mode")
+    parser.add_argument("--renderer", choices=["auto", "streaming", "template"], default="auto", help="Output renderer")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="Baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="Record these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=1.5, help="Allowed slowdown factor before failing")
+    args = parser.parse_args(argv)
+    for case in args.cases:
+        if case not in CASES and case != STARTUP_CASE:
+            parser.error(f"unknown case '{case}' (expected one of {', '.join([*CASES, STARTUP_CASE])})")
+
+    streaming = {"auto": None, "streaming": True, "template": False}[args.renderer]
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    calibration = calibrate()
+    baseline_calibration = baseline.get(CALIBRATION_KEY, {}).get("seconds")
+    scale = 1.0
+    if args.save_baseline:
+        print(f"Calibration: {calibration:.3f}s")
+    elif baseline_calibration:
+        scale = calibration / baseline_calibration
+        print(f"Calibration: {calibration:.3f}s (baseline scaled by {scale:.2f})")
+    elif baseline:
+        print("Baseline has no calibration: comparing raw timings; re-record it with --save-baseline",
+              file=sys.stderr)
+
+    results = {}
+    for case in args.cases or [*CASES, STARTUP_CASE]:
+        if case == STARTUP_CASE:
+            results[case] = run_startup(args.repeat)
+        else:
+            results[case] = run_case(CASES[case], args.repeat, args.mode, streaming)
+
+    keys = {case: baseline_key(case, args.mode, args.renderer) for case in results}
+    references = {case: baseline[key] for case, key in keys.items() if key in baseline}
+    if baseline and not args.save_baseline:
+        for case in results.keys() - references.keys():
+            print(f"No baseline for {keys[case]}; record one with --save-baseline", file=sys.stderr)
+    print_table(results, {} if args.save_baseline else references, scale)
+
+    if args.save_baseline:
+        baseline.update({keys[case]: result for case, result in results.items()})
+        baseline[CALIBRATION_KEY] = {"seconds": calibration}
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    regressions = compare(results, references, args.tolerance, scale)
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
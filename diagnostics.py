@@ -0,0 +1,112 @@
+"""Per-phase wall time, peak memory and counts for the allocation pipeline.
+
+A report is a dict collecting one record per phase; every finished phase
+is also logged as a JSON line on the "manmonths.diagnostics" logger.
+Diagnostics are off unless asked for (``AM_DIAGNOSTICS=1`` or an explicit
+``enabled=True``); disabled reports are ``None`` and ``phase`` does no
+timing, tracing or logging for them.
+"""
+import contextlib
+import json
+import logging
+import os # Import os module to read the environment switch
+import sys
+import threading
+import time
+import tracemalloc
+
+ENV_SWITCH = "AM_DIAGNOSTICS"
+
+logger = logging.getLogger("manmonths.diagnostics")
+if not logger.handlers:
+    # One JSON object per line on stderr, for log scrapers
+    _handler = logging.StreamHandler(sys.stderr)
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+# tracemalloc is process-wide while reports may overlap (Streamlit sessions,
+# threads): it runs while any memory-tracking report is open, and is only
+# stopped by the last one if a report started it
+_tracing = {"reports": 0, "started": False}
+_tracing_lock = threading.Lock()
+
+
+def diagnostics_enabled():
+    return os.environ.get(ENV_SWITCH, "").lower() in ("1", "true", "yes", "on")
+
+
+def new_report(enabled=None, track_memory=True, **context):
+    """Return a new report, or None when diagnostics are disabled.
+
+    ``context`` (e.g. file name, mode) is repeated on every log line.
+    ``track_memory`` measures each phase's peak with tracemalloc, which
+    also slows the traced code down.
+    """
+    if enabled is None:
+        enabled = diagnostics_enabled()
+    if not enabled:
+        return None
+    if track_memory:
+        with _tracing_lock:
+            if _tracing["reports"] == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start()
+                _tracing["started"] = True
+            _tracing["reports"] += 1
+    return {"context": context, "phases": [], "track_memory": track_memory,
+            "holds_tracing": track_memory, "started_at": time.perf_counter()}
+
+
+@contextlib.contextmanager
+def phase(report, name, **counts):
+    """Time the enclosed block as phase ``name`` of ``report``.
+
+    Yields the phase's counts dict, so the block can add row or cell counts
+    once it knows them. Peaks are process-wide, so phases running at the
+    same time in other threads are counted too.
+    """
+    if report is None:
+        yield counts
+        return
+
+    if report["track_memory"]:
+        tracemalloc.reset_peak()
+        memory_before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    try:
+        yield counts
+    finally:
+        record = {"phase": name, "seconds": round(time.perf_counter() - start, 4)}
+        if report["track_memory"]:
+            record["peak_mb"] = round((tracemalloc.get_traced_memory()[1] - memory_before) / 2**20, 2)
+        record.update(counts)
+        report["phases"].append(record)
+        _log("phase", report, record)
+
+
+def finish(report):
+    """Log the report's totals and release its hold on memory tracing.
+
+    Tracing stops when no open report tracks memory any more (and it was
+    started by a report). Finishing a report twice does nothing more.
+    """
+    if report is None or "total" in report:
+        return report
+    total = {"seconds": round(time.perf_counter() - report["started_at"], 4),
+             "phases": len(report["phases"])}
+    if report["holds_tracing"]:
+        with _tracing_lock:
+            _tracing["reports"] -= 1
+            if _tracing["reports"] == 0 and _tracing["started"]:
+                tracemalloc.stop()
+                _tracing["started"] = False
+        report["holds_tracing"] = False
+    report["total"] = total
+    _log("pipeline", report, total)
+    return report
+
+
+def _log(event, report, record):
+    logger.info(json.dumps({"event": event, **report["context"], **record}, ensure_ascii=False, default=str))
@@ -0,0 +1,1581 @@
+import openpyxl
+from openpyxl.styles import PatternFill, Border, Side, Font, Alignment
+from openpyxl.styles.cell_style import StyleArray
+from openpyxl.styles.numbers import BUILTIN_FORMATS_MAX_SIZE, BUILTIN_FORMATS_REVERSE
+from openpyxl.cell import Cell
+from openpyxl.cell._writer import etree_write_cell
+from openpyxl.xml.functions import fromstring, tostring
+from openpyxl.utils.indexed_list import IndexedList
+from openpyxl.worksheet.dimensions import DimensionHolder
+import copyreg # Import copyreg to make template snapshots picklable
+import csv # Import csv to export summary tables
+import calendar # Import calendar for month lengths
+from datetime import date, datetime
+import functools # Import functools to memoize parsed periods
+import io # Import io to build CSV exports in memory
+import re
+import types # Import types for the cell sink of prebuilt XML rows
+import os # Import os module for path handling
+from xml.etree import ElementTree # Import ElementTree to read column widths from read-only sheets
+import pickle # Import pickle to snapshot parsed templates in memory
+
+import diagnostics # Optional per-phase timing and memory reports
+import flow # Max-flow solver for the optimal allocation mode
+from modes import GREEDY, MAX_FLOW, ALLOCATION_MODES # Allocation modes (also read by the app's landing page)
+
+# --- Bundled template (same file the app downloads from GitHub) ---
+TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "AM TEST 1.xlsx")
+
+# --- Input headers and output naming ---
+PERIOD_HEADER = "ΧΡΟΝΙΚΟ ΔΙΑΣΤΗΜΑ"
+AM_HEADER = "ΑΝΘΡΩΠΟΜΗΝΕΣ"
+OUTPUT_SUFFIX = "_ΚΑΤΑΝΟΜΗ ΑΜ.xlsx"
+
+# --- Template layout ---
+START_ROW_DATA = 4 # Data starts here
+YEAR_ROW = 2  # Years go here
+MONTH_ROW = 3 # Months go here
+YEARLY_TOTAL_ROW = START_ROW_DATA + 1 # New row for yearly totals
+START_COL = 5 # Month 1 of first year starts in column E
+MAX_YEARLY_CAPACITY = 11 # Maximum person-months that can be allocated per year
+
+# --- Project prioritization strategies (ties keep input order) ---
+SHORTEST_FIRST = "shortest-first" # Fewer months in period first (default)
+ORDERINGS = {
+    SHORTEST_FIRST: lambda x: (x["months_in_period_count"], x["project_id"]),
+    "longest-first": lambda x: (-x["months_in_period_count"], x["project_id"]),
+    "earliest-end-first": lambda x: (x["months_in_period"][-1] if x["months_in_period"] else (0, 0), x["project_id"]),
+    "densest-first": lambda x: (-x["am_per_month_ratio"], x["project_id"]), # Highest AM per month in period first
+    "largest-am-first": lambda x: (-x["original_am"], x["project_id"]),
+    "input-order": lambda x: x["project_id"],
+}
+STREAMING_ROW_THRESHOLD = 500 # Projects above which the write-only renderer is used
+MATCH_FORMULA = '=MATCH(B6,CV!$B$2:$B$100,0)' # Formula placed in A6 of the 'ΑΝΑΛΥΣΗ' sheet
+
+yellow = PatternFill(start_color="FFFF00", end_color="FFFF00", fill_type="solid")
+red_fill = PatternFill(start_color="FF0000", end_color="FF0000", fill_type="solid")
+green_fill = PatternFill(start_color="00FF00", end_color="00FF00", fill_type="solid")
+no_fill = PatternFill()
+
+bold_font = Font(bold=True)
+black_font = Font(color="000000")
+white_font = Font(color="FFFFFF")
+black_bold_font = Font(color="000000", bold=True)
+white_bold_font = Font(color="FFFFFF", bold=True)
+red_bold_font = Font(color="FF0000", bold=True)
+
+# Define thin border style
+thin_border = Border(left=Side(style='thin'),
+                     right=Side(style='thin'),
+                     top=Side(style='thin'),
+                     bottom=Side(style='thin'))
+
+
+# ------------------------------------------------
+# Συναρτήσεις ημερομηνιών
+# ------------------------------------------------
+# Precompiled endpoint formats: YYYY, M/YYYY, D/M/YYYY
+_YEAR_RE = re.compile(r"^(\d{4})$")
+_MONTH_YEAR_RE = re.compile(r"^(\d{1,2})/(\d{4})$")
+_DAY_MONTH_YEAR_RE = re.compile(r"^(\d{1,2})/(\d{1,2})/(\d{4})$")
+_TODAY_WORDS = ("σήμερα", "simera") # Added 'simera' as a fallback, user provided 'σήμερα'
+_DASHES = str.maketrans({"—": "-", "–": "-"})
+PERIOD_CACHE_SIZE = 4096 # Distinct period strings memoized by parse_period
+
+def _last_day(year, month):
+    return calendar.monthrange(year, month)[1]
+
+def _make_date(text, year, month, day):
+    try:
+        return datetime(year, month, day)
+    except ValueError:
+        raise ValueError(f"Invalid date: '{text}'.") from None
+
+def parse_date(text, is_start=True):
+    # Excel date cells arrive as datetime objects and are used as they are
+    if isinstance(text, datetime):
+        return text
+    if isinstance(text, date):
+        return datetime(text.year, text.month, text.day)
+
+    text = str(text).strip() # Ensure text is always a string and stripped
+
+    # Handle 'σήμερα' (today) keyword; it is only supported as an end date and
+    # as a start date falls through to the format checks, which reject it
+    lowered = text.lower()
+    if not is_start and any(word in lowered for word in _TODAY_WORDS):
+        return datetime.today()
+
+    match = _YEAR_RE.match(text) # Check for YYYY format
+    if match:
+        year = int(match.group(1))
+        # Start or end of the year
+        return _make_date(text, year, 1, 1) if is_start else _make_date(text, year, 12, 31)
+
+    match = _MONTH_YEAR_RE.match(text) # Check for MM/YYYY format
+    if match:
+        month, year = int(match.group(1)), int(match.group(2))
+        if not 1 <= month <= 12:
+            raise ValueError(f"Invalid date: '{text}'.")
+        # For MM/YYYY as start it's the 1st of the month, as end the last day
+        return _make_date(text, year, month, 1 if is_start else _last_day(year, month))
+
+    match = _DAY_MONTH_YEAR_RE.match(text) # Check for DD/MM/YYYY format
+    if match:
+        day, month, year = (int(g) for g in match.groups())
+        return _make_date(text, year, month, day)
+
+    # If none of the above formats match, raise a more informative error
+    raise ValueError(f"Unsupported date format: '{text}'. Expected 'YYYY', 'M/YYYY' or 'MM/YYYY', 'D/M/YYYY' or 'DD/MM/YYYY', or 'Σήμερα' (for end date).")
+
+@functools.lru_cache(maxsize=PERIOD_CACHE_SIZE)
+def _parse_period_text(text, today):
+    # ``today`` only keys the cache, so 'Σήμερα' periods expire at midnight
+    p_cleaned = text.strip().translate(_DASHES)
+
+    # Check if the cleaned string is a single year (e.g., "2022")
+    if _YEAR_RE.match(p_cleaned):
+        # If it's a single year, treat it as the entire year
+        return parse_date(p_cleaned, True), parse_date(p_cleaned, False)
+
+    parts = p_cleaned.split("-")
+    if len(parts) != 2:
+        raise ValueError(f"Invalid period format: '{text}'. Expected 'YYYY' or 'START_DATE-END_DATE'.")
+    a, b = parts
+    return parse_date(a, True), parse_date(b, False)
+
+def _parse_period_value(p, today):
+    if isinstance(p, (datetime, date)):
+        # A date cell (Excel converts e.g. '3/2019') covers the month it falls in
+        return datetime(p.year, p.month, 1), datetime(p.year, p.month, _last_day(p.year, p.month))
+    if isinstance(p, float) and p.is_integer():
+        p = int(p) # A year typed into a numeric cell
+    return _parse_period_text(str(p), today)
+
+def parse_period(p):
+    """Return the (start, end) datetimes of a period cell value.
+
+    Accepts strings, Excel date cells and years stored as numbers. String
+    periods are memoized, since CVs repeat the same ranges many times.
+    """
+    return _parse_period_value(p, date.today())
+
+def parse_periods(cells):
+    """Parse many (row, period) pairs in one pass.
+
+    Returns (parsed, errors): ``parsed`` holds (row, start, end) tuples and
+    ``errors`` one {"row", "period", "error"} dict per rejected row, so
+    failures are reported together rather than row by row.
+    """
+    today = date.today()
+    parsed = []
+    errors = []
+    for row, period in cells:
+        try:
+            start, end = _parse_period_value(period, today)
+        except ValueError as e:
+            errors.append({"row": row, "period": str(period), "error": str(e)})
+            continue
+        parsed.append((row, start, end))
+    return parsed, errors
+
+def format_parse_error(error):
+    # One-line text for logs and consoles
+    return f"Skipping row {error['row']} due to period parsing error: {error['error']}"
+
+def month_index(year, month):
+    # Absolute month number; consecutive months differ by one
+    return year * 12 + month - 1
+
+def month_range(start, end):
+    first = month_index(start.year, start.month)
+    last = month_index(end.year, end.month)
+    return [(i // 12, i % 12 + 1) for i in range(first, last + 1)]
+
+# Function to determine if a color is light or dark (for text readability)
+def is_light_color(hex_color):
+    hex_color = hex_color.lstrip('#')
+    rgb = tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
+    # Calculate luminance (Y = 0.299R + 0.587G + 0.114B)
+    luminance = (0.299 * rgb[0] + 0.587 * rgb[1] + 0.114 * rgb[2]) / 255
+    return luminance > 0.5 # Threshold can be adjusted
+
+# ------------------------------------------------
+# Template snapshots
+# ------------------------------------------------
+# Parsed templates pickled per (path, mtime); unpickling is several times
+# cheaper than re-reading the XLSX zip and copy.deepcopy breaks the stylesheet.
+_template_snapshots = {}
+
+def _reduce_dimension_holder(holder):
+    # The inherited defaultdict reduce drops the worksheet, reference and factory
+    return (DimensionHolder, (holder.worksheet, holder.reference, holder.default_factory),
+            holder.__dict__, None, iter(holder.items()))
+
+copyreg.pickle(DimensionHolder, _reduce_dimension_holder)
+
+def snapshot_template(source):
+    # Parse a template once, clear its data area and return a picklable snapshot
+    wb = openpyxl.load_workbook(source)
+    reset_template(wb.active)
+    return pickle.dumps(wb, protocol=pickle.HIGHEST_PROTOCOL)
+
+def clone_template(snapshot):
+    # Return a fresh, independent Workbook from a snapshot
+    return pickle.loads(snapshot)
+
+def load_template(source=TEMPLATE_PATH):
+    """Return a fresh template Workbook from a Workbook, path or file-like object.
+
+    Paths are parsed once per process and cloned from memory afterwards.
+    """
+    if isinstance(source, openpyxl.Workbook):
+        return source
+    if isinstance(source, (str, os.PathLike)):
+        key = os.path.abspath(source)
+        mtime = os.path.getmtime(key)
+        cached = _template_snapshots.get(key)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, snapshot_template(key))
+            _template_snapshots[key] = cached
+        return clone_template(cached[1])
+    return openpyxl.load_workbook(source)
+
+def output_filename(input_name):
+    # Extract base name without extension and append the allocation suffix
+    base_name = os.path.splitext(os.path.basename(input_name))[0]
+    return f"{base_name}{OUTPUT_SUFFIX}"
+
+
+# ------------------------------------------------
+# Διαβάζουμε INPUT και βρίσκουμε στήλες
+# ------------------------------------------------
+def input_rows(ws_in):
+    """Return the input sheet's candidate rows as [(row, period, am)].
+
+    Works on regular and read-only worksheets; rows are streamed with
+    ``iter_rows(values_only=True)`` instead of random ``cell()`` access.
+    Rows without a period or with 0 AMs are left out. Raises ValueError
+    if the required headers are missing.
+    """
+    rows = ws_in.iter_rows(values_only=True)
+    header_row = next(rows, ())
+
+    headers = {}
+    for c, value in enumerate(header_row):
+        val = str(value).strip()
+        headers[val] = c
+
+    if PERIOD_HEADER not in headers or AM_HEADER not in headers:
+        raise ValueError("Το input πρέπει να έχει στήλες: ΧΡΟΝΙΚΟ ΔΙΑΣΤΗΜΑ και ΑΝΘΡΩΠΟΜΗΝΕΣ")
+
+    PERIOD_COL = headers[PERIOD_HEADER]
+    AM_COL = headers[AM_HEADER]
+
+    candidates = []
+    for r, row_values in enumerate(rows, start=2):
+        # Read-only sheets may yield short rows when trailing cells are empty
+        period = row_values[PERIOD_COL] if PERIOD_COL < len(row_values) else None
+        am = parse_am(row_values[AM_COL] if AM_COL < len(row_values) else None)
+
+        if not period or am == 0: # Skip rows with no period or 0 AMs
+            continue
+
+        candidates.append((r, period, am))
+    return candidates
+
+def parse_am(value):
+    # AM cell value -> int; anything non-numeric counts as 0
+    try:
+        return int(value) if value is not None else 0
+    except (ValueError, TypeError):
+        return 0 # Handle non-numeric or None values
+
+def read_input(ws_in):
+    """Parse the input sheet into project rows.
+
+    Returns (data, years, parse_errors). Raises ValueError if the required
+    headers are missing; rows with unparseable periods are skipped and
+    reported in parse_errors (see parse_periods).
+    """
+    return project_rows(input_rows(ws_in))
+
+def new_project(project_id, r, period, am, start, end):
+    # One project row of the allocation input; ``start``/``end`` as parse_period returns them
+    months = month_range(start, end)
+    months_in_period_count = len(months)
+
+    if months_in_period_count > 0: # Avoid division by zero
+        am_per_month_ratio = am / months_in_period_count
+    else:
+        am_per_month_ratio = 0
+
+    return {
+        "project_id": project_id, # Unique ID, in input order
+        "row": r, # Input sheet row
+        "period_str": period,
+        "original_am": am,
+        "months_in_period": months,
+        "months_in_period_count": months_in_period_count,
+        "am_per_month_ratio": am_per_month_ratio,
+        "allocated_am": 0,
+        "unallocated_am": am
+    }
+
+def project_rows(candidates):
+    """Parse [(row, period, am)] candidates into (data, years, parse_errors)."""
+    amounts = {r: am for r, period, am in candidates}
+    parsed, parse_errors = parse_periods([(r, period) for r, period, am in candidates])
+    periods = {r: period for r, period, am in candidates}
+
+    data = []
+    all_months = set()
+
+    for project_counter, (r, start, end) in enumerate(parsed):
+        project_data = new_project(project_counter, r, periods[r], amounts[r], start, end)
+        data.append(project_data)
+        all_months.update(project_data["months_in_period"])
+
+    all_months = sorted(all_months)
+    years = sorted(set(y for y,m in all_months))
+
+    return data, years, parse_errors
+
+def rows_worksheet(rows):
+    """Return a worksheet with (period, am) rows under the input headers.
+
+    Rows that do not come from a workbook (e.g. JSON) then go through
+    read_input and onto the CV sheet exactly like an uploaded file.
+    """
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append([PERIOD_HEADER, AM_HEADER])
+    for period, am in rows:
+        ws.append([period, am])
+    return ws
+
+def edit_input_sheet(ws_in, changes):
+    """Write {row: (period, am)} edits into a (not read-only) input sheet, for the CV copy."""
+    headers = {str(cell.value).strip(): cell.column for cell in ws_in[1]}
+    for r, (period, am) in changes.items():
+        # Assigned, not passed to ws_in.cell(): that ignores value=None, which clears a cell
+        ws_in.cell(row=r, column=headers[PERIOD_HEADER]).value = period
+        ws_in.cell(row=r, column=headers[AM_HEADER]).value = am
+
+
+# ------------------------------------------------
+# Greedy Allocation
+# ------------------------------------------------
+def _set_bits(mask):
+    # Offsets of the set bits of mask, lowest first. Scanning the reversed binary
+    # string avoids re-allocating a wide int for every bit that is cleared.
+    bits = bin(mask)[:1:-1]
+    offsets = []
+    i = bits.find("1")
+    while i >= 0:
+        offsets.append(i)
+        i = bits.find("1", i + 1)
+    return offsets
+
+def _unallocated_reasons(reason_months, capacity_months, month_owner, base_index):
+    # Reasons in chronological order of first appearance, without duplicates
+    reasons = []
+    reported_years = set()
+    capacity_bits = bin(capacity_months)[:1:-1]
+    for offset in _set_bits(reason_months):
+        y, m = divmod(base_index + offset, 12)
+        if offset < len(capacity_bits) and capacity_bits[offset] == "1":
+            if y not in reported_years:
+                reported_years.add(y)
+                reasons.append(f"Year {y} capacity reached")
+        else:
+            reasons.append(f"Month {m + 1}/{y} already allocated by Project {month_owner[offset]}")
+    return reasons
+
+def _take_months(span, am, occupied, blocked, yearly_totals, max_yearly_capacity):
+    # Greedy step for one project: take up to ``am`` of the earliest free months of
+    # ``span``, counting them in ``yearly_totals`` (updated in place). Returns the taken
+    # months, their count, the new blocked set and the months blocked mid-project.
+    taken = 0
+    count = 0
+    blocked_during = 0
+    free = span & ~(occupied | blocked)
+    while free and count < am:
+        low = free & -free
+        year_offset = (low.bit_length() - 1) // 12
+        taken |= low
+        yearly_totals[year_offset] += 1
+        count += 1
+        free ^= low
+
+        if yearly_totals[year_offset] >= max_yearly_capacity:
+            year_mask = 0xFFF << (year_offset * 12)
+            blocked |= year_mask
+            blocked_during |= year_mask & ~((low << 1) - 1) # Only months after this one
+            free &= ~year_mask
+    return taken, count, blocked, blocked_during
+
+def allocate_greedy(data, years, max_yearly_capacity=MAX_YEARLY_CAPACITY, with_reasons=True, ordering=SHORTEST_FIRST):
+    """Greedily allocate person-months, one project per month.
+
+    Months are integer offsets from January of the first year. Occupancy and
+    full years are int bitsets, so each project's free months are found with
+    a few word-level operations over its span instead of a per-month dict
+    scan. Sorts ``data`` in place by ``ordering`` (see ORDERINGS) and fills each
+    project's "allocated_months", "allocated_am" and "unallocated_am".
+    Returns a dict with yearly_am_totals, yearly_overages,
+    unallocated_projects and max_yearly_capacity; ``with_reasons=False``
+    leaves the unallocated reasons empty.
+    """
+    # Project Prioritization: Sort data before allocation
+    # By default prioritize projects with shorter durations (fewer months in period)
+    data.sort(key=ORDERINGS[ordering])
+
+    first_year = years[0] if years else 0
+    base_index = month_index(first_year, 1)
+    year_count = years[-1] - first_year + 1 if years else 0
+
+    yearly_totals = [0] * year_count
+    # Tracks month offset to project_id to allow reporting which project filled a slot
+    month_owner = [None] * (year_count * 12)
+    occupied = 0 # Bit per allocated month
+    blocked = 0 # Bit per month of a year that reached capacity
+    if max_yearly_capacity <= 0:
+        blocked = (1 << (year_count * 12)) - 1
+
+    unallocated_projects = []
+    yearly_overages = {}
+
+    for project_data in data:
+        original_am = project_data["original_am"]
+        months_in_period = project_data["months_in_period"]
+        project_id = project_data["project_id"]
+        allocated_months = []
+
+        if months_in_period:
+            # month_range is contiguous and chronological, so the span is a bit run
+            first = month_index(*months_in_period[0]) - base_index
+            span = ((1 << len(months_in_period)) - 1) << first
+        else:
+            span = 0
+
+        occupied_before = occupied
+        blocked_before = blocked
+
+        taken, allocated_count, blocked, blocked_during = _take_months(span, original_am, occupied, blocked,
+                                                                       yearly_totals, max_yearly_capacity)
+        occupied |= taken
+        for offset in _set_bits(taken):
+            # Allocate one person-month to this slot
+            allocated_months.append(divmod(base_index + offset, 12))
+            month_owner[offset] = project_id # Mark month as allocated by this project ID
+
+        allocated_months = [(y, m + 1) for y, m in allocated_months]
+        unallocated_count = original_am - allocated_count
+
+        project_data["allocated_months"] = allocated_months
+        project_data["allocated_am"] = allocated_count
+        project_data["unallocated_am"] = unallocated_count
+
+        if unallocated_count > 0:
+            reasons = []
+            if with_reasons:
+                # The whole span was scanned: a month was skipped for capacity if its year
+                # was full when reached, otherwise because another project held it
+                capacity_months = span & (blocked_before | blocked_during)
+                taken_months = span & occupied_before & ~capacity_months
+                reasons = _unallocated_reasons(capacity_months | taken_months, capacity_months, month_owner, base_index)
+            unallocated_projects.append({
+                "period": project_data["period_str"],
+                "original_am": original_am,
+                "allocated_am": allocated_count,
+                "unallocated_am": unallocated_count,
+                "reasons": "; ".join(reasons)
+            })
+
+    yearly_am_totals = {y: yearly_totals[y - first_year] for y in years}
+    for y, total_am in yearly_am_totals.items():
+        if total_am > max_yearly_capacity:
+            yearly_overages[y] = total_am - max_yearly_capacity
+
+    return {
+        "yearly_am_totals": yearly_am_totals,
+        "yearly_overages": yearly_overages,
+        "unallocated_projects": unallocated_projects,
+        "max_yearly_capacity": max_yearly_capacity,
+    }
+
+
+def _segment_nodes(first, last, size):
+    # Canonical segment-tree nodes covering leaves first..last (inclusive), left to right
+    left_nodes, right_nodes = [], []
+    lo, hi = first + size, last + size + 1
+    while lo < hi:
+        if lo & 1:
+            left_nodes.append(lo)
+            lo += 1
+        if hi & 1:
+            hi -= 1
+            right_nodes.append(hi)
+        lo >>= 1
+        hi >>= 1
+    return left_nodes + right_nodes[::-1]
+
+def allocate_max_flow(data, years, max_yearly_capacity=MAX_YEARLY_CAPACITY, ordering=SHORTEST_FIRST):
+    """Allocate the maximum feasible number of person-months.
+
+    Flow network: source -> project (original AM) -> months of its period ->
+    month (1) -> year -> sink (yearly capacity). Because each month carries at
+    most one unit, a project reaches its months through the O(log M)
+    canonical nodes of a segment tree over the months instead of one edge
+    per month. Dinic's algorithm is warm-started from the greedy allocation,
+    so only what greedy could not place needs augmenting paths; months are
+    then handed back to projects leftmost-first. Same inputs, side effects
+    and return value as allocate_greedy.
+    """
+    # Sorts data and gives a feasible starting flow; the ordering only changes
+    # which projects end up with the months, never the total
+    allocate_greedy(data, years, max_yearly_capacity, with_reasons=False, ordering=ordering)
+
+    first_year = years[0] if years else 0
+    base_index = month_index(first_year, 1)
+    year_count = years[-1] - first_year + 1 if years else 0
+    month_count = year_count * 12
+    size = 1
+    while size < month_count:
+        size *= 2
+    unbounded = sum(max(p["original_am"], 0) for p in data) + 1
+
+    # Node numbering: source, sink, projects, segment tree (1 .. 2*size-1), years
+    SOURCE, SINK = 0, 1
+    tree_node = 2 + len(data)
+    year_node = tree_node + 2 * size
+    graph = flow.new_graph(year_node + year_count)
+    cap = graph["cap"]
+
+    def push(e):
+        # Route one unit of the starting flow along edge e
+        cap[e] -= 1
+        cap[e ^ 1] += 1
+
+    parent_edge = [None] * (2 * size) # Edge into each tree node from its parent
+    for node in range(2, 2 * size):
+        parent_edge[node] = flow.add_edge(graph, tree_node + (node >> 1), tree_node + node, unbounded)
+    leaf_edges = [flow.add_edge(graph, tree_node + size + offset, year_node + offset // 12, 1) for offset in range(month_count)]
+    year_edges = [flow.add_edge(graph, year_node + year_offset, SINK, max(max_yearly_capacity, 0)) for year_offset in range(year_count)]
+
+    project_edges = []
+    for p, project_data in enumerate(data):
+        source_edge = flow.add_edge(graph, SOURCE, 2 + p, max(project_data["original_am"], 0))
+        edges = {}
+        if project_data["months_in_period"]:
+            first = month_index(*project_data["months_in_period"][0]) - base_index
+            last = first + len(project_data["months_in_period"]) - 1
+            for node in _segment_nodes(first, last, size):
+                edges[node] = flow.add_edge(graph, 2 + p, tree_node + node, unbounded)
+        project_edges.append(edges)
+
+        # Load the greedy months: project -> covering canonical node -> ... -> leaf -> year -> sink
+        for (y, m) in project_data["allocated_months"]:
+            offset = month_index(y, m) - base_index
+            node = size + offset
+            while node not in edges:
+                push(parent_edge[node])
+                node >>= 1
+            push(edges[node])
+            push(source_edge)
+            push(leaf_edges[offset])
+            push(year_edges[offset // 12])
+
+    flow.max_flow(graph, SOURCE, SINK)
+
+    # Decompose: send each project's units down the tree, earliest months first
+    remaining = [cap[e ^ 1] if e is not None else 0 for e in parent_edge]
+    yearly_totals = [0] * year_count
+    month_owner = [None] * month_count
+    occupied = 0
+    for project_data, edges in zip(data, project_edges):
+        allocated_offsets = []
+        for start_node, e in edges.items():
+            for _ in range(cap[e ^ 1]):
+                node = start_node
+                while node < size:
+                    node *= 2
+                    if not remaining[node]:
+                        node += 1
+                    remaining[node] -= 1
+                allocated_offsets.append(node - size)
+        allocated_offsets.sort()
+        for offset in allocated_offsets:
+            month_owner[offset] = project_data["project_id"]
+            occupied |= 1 << offset
+            yearly_totals[offset // 12] += 1
+        project_data["allocated_months"] = [(i // 12, i % 12 + 1) for i in (base_index + o for o in allocated_offsets)]
+        project_data["allocated_am"] = len(allocated_offsets)
+        project_data["unallocated_am"] = project_data["original_am"] - len(allocated_offsets)
+
+    full_years = 0
+    for year_offset, total_am in enumerate(yearly_totals):
+        if total_am >= max_yearly_capacity:
+            full_years |= 0xFFF << (year_offset * 12)
+
+    unallocated_projects = []
+    for project_data in data:
+        if project_data["unallocated_am"] <= 0:
+            continue
+        months_in_period = project_data["months_in_period"]
+        span = 0
+        if months_in_period:
+            span = ((1 << len(months_in_period)) - 1) << (month_index(*months_in_period[0]) - base_index)
+        # Every month of the span is either in a full year or held by another project
+        capacity_months = span & full_years
+        taken_months = span & occupied & ~capacity_months
+        reasons = _unallocated_reasons(capacity_months | taken_months, capacity_months, month_owner, base_index)
+        unallocated_projects.append({
+            "period": project_data["period_str"],
+            "original_am": project_data["original_am"],
+            "allocated_am": project_data["allocated_am"],
+            "unallocated_am": project_data["unallocated_am"],
+            "reasons": "; ".join(reasons)
+        })
+
+    yearly_am_totals = {y: yearly_totals[y - first_year] for y in years}
+    yearly_overages = {y: total_am - max_yearly_capacity
+                       for y, total_am in yearly_am_totals.items() if total_am > max_yearly_capacity}
+
+    return {
+        "yearly_am_totals": yearly_am_totals,
+        "yearly_overages": yearly_overages,
+        "unallocated_projects": unallocated_projects,
+        "max_yearly_capacity": max_yearly_capacity,
+    }
+
+def allocate(data, years, max_yearly_capacity=MAX_YEARLY_CAPACITY, mode=GREEDY, ordering=SHORTEST_FIRST):
+    """Allocate person-months with the given mode (GREEDY or MAX_FLOW) and ordering."""
+    if ordering not in ORDERINGS:
+        raise ValueError(f"Unknown ordering: '{ordering}'. Expected one of {', '.join(ORDERINGS)}.")
+    if mode == MAX_FLOW:
+        return allocate_max_flow(data, years, max_yearly_capacity, ordering)
+    if mode == GREEDY:
+        return allocate_greedy(data, years, max_yearly_capacity, ordering=ordering)
+    raise ValueError(f"Unknown allocation mode: '{mode}'. Expected one of {', '.join(ALLOCATION_MODES)}.")
+
+
+# ------------------------------------------------
+# Σταδιακή κατανομή (incremental re-allocation after edits)
+# ------------------------------------------------
+# Greedy results depend only on the earlier projects' months in the years a
+# project spans. The state keeps every project's taken months, so after an
+# edit the projects are replayed in order and a project is recomputed only
+# if it was edited or spans a year in which an earlier result changed.
+def new_allocation_state(candidates, max_yearly_capacity=MAX_YEARLY_CAPACITY, ordering=SHORTEST_FIRST):
+    """Parse and greedily allocate [(row, period, am)] candidates (see input_rows).
+
+    Returns the state edit_rows updates and allocation_result reads.
+    """
+    if ordering not in ORDERINGS:
+        raise ValueError(f"Unknown ordering: '{ordering}'. Expected one of {', '.join(ORDERINGS)}.")
+    state = {
+        "capacity": max_yearly_capacity,
+        "ordering": ordering,
+        "candidates": {r: (period, am) for r, period, am in candidates},
+        "projects": {}, # Row -> project data
+        "errors": {}, # Row -> parse error
+        "order": [], # Rows in allocation order
+        "spans": {}, # Row -> month bitset of its period
+        "taken": {}, # Row -> month bitset it was allocated
+        "year_counts": {}, # Row -> [(year offset, months taken)]
+        "reason_months": {}, # Row -> (capacity months, taken months) when not fully allocated
+        "month_owner": {}, # Month offset -> row
+        "reasons": {}, # Row -> formatted unallocated reasons, until the row or a project ID changes
+        "year_rows": {}, # Year -> number of projects whose period covers it
+        "yearly_totals": [],
+        "first_year": 0,
+        "year_count": 0,
+    }
+    parsed, parse_errors = parse_periods([(r, period) for r, period, am in candidates])
+    for project_id, (r, start, end) in enumerate(parsed):
+        period, am = state["candidates"][r]
+        state["projects"][r] = new_project(project_id, r, period, am, start, end)
+        _count_years(state, state["projects"][r], 1)
+    state["errors"] = {error["row"]: error for error in parse_errors}
+    state["order"] = sorted(state["projects"], key=lambda r: ORDERINGS[ordering](state["projects"][r]))
+    _reset_axis(state)
+    _replay(state, 0, set(state["projects"]))
+    return state
+
+def edit_rows(state, changes):
+    """Apply {row: (period, am)} edits to ``state`` and re-allocate what they affect.
+
+    A row with no period or 0 AMs is dropped, like in input_rows. Returns
+    the number of projects that were recomputed.
+    """
+    projects = state["projects"]
+    dirty = 0 # Year masks in which an earlier project's months may change
+    forced = set()
+    rows_changed = False
+
+    new_rows = []
+    for r, (period, am) in changes.items():
+        am = parse_am(am)
+        if r in projects:
+            dirty |= _year_masks(state["taken"][r])
+            _drop_project(state, r)
+            rows_changed = True
+        state["errors"].pop(r, None)
+        state["candidates"].pop(r, None)
+        if period and am != 0:
+            state["candidates"][r] = (period, am)
+            new_rows.append((r, period))
+
+    parsed, parse_errors = parse_periods(new_rows)
+    for r, start, end in parsed:
+        period, am = state["candidates"][r]
+        projects[r] = new_project(None, r, period, am, start, end)
+        _count_years(state, projects[r], 1)
+        forced.add(r)
+        rows_changed = True
+    state["errors"].update((error["row"], error) for error in parse_errors)
+
+    if rows_changed:
+        # Project IDs follow input order, as read_input numbers them
+        ids_changed = False
+        for project_id, r in enumerate(sorted(projects)):
+            ids_changed = ids_changed or projects[r]["project_id"] not in (project_id, None)
+            projects[r]["project_id"] = project_id
+        if ids_changed:
+            state["reasons"] = {} # They name the projects holding the months
+        state["order"] = [r for r in state["order"] if r in projects and r not in forced] + sorted(forced)
+        state["order"].sort(key=lambda r: ORDERINGS[state["ordering"]](projects[r]))
+
+    years = _project_years(state)
+    last_year = state["first_year"] + state["year_count"] - 1
+    if years and (years[0] < state["first_year"] or years[-1] > last_year):
+        # The month axis has to grow: every bitset moves, so replay everything
+        _reset_axis(state)
+        forced = set(projects)
+    for r in forced:
+        state["spans"][r] = _project_span(state, projects[r])
+    return _replay(state, dirty, forced)
+
+def allocation_result(state):
+    """Return (data, years, allocation, parse_errors) for the state, like read_input + allocate."""
+    projects = state["projects"]
+    data = [projects[r] for r in state["order"]]
+    years = _project_years(state)
+    first_year = state["first_year"]
+    base_index = month_index(first_year, 1)
+    max_yearly_capacity = state["capacity"]
+
+    unallocated_projects = []
+    for project_data in data:
+        if project_data["unallocated_am"] <= 0:
+            continue
+        r = project_data["row"]
+        reasons = state["reasons"].get(r)
+        if reasons is None:
+            capacity_months, taken_months = state["reason_months"][r]
+            month_owner = {offset: projects[state["month_owner"][offset]]["project_id"] for offset in _set_bits(taken_months)}
+            reasons = state["reasons"][r] = "; ".join(_unallocated_reasons(capacity_months | taken_months, capacity_months,
+                                                                           month_owner, base_index))
+        unallocated_projects.append({
+            "period": project_data["period_str"],
+            "original_am": project_data["original_am"],
+            "allocated_am": project_data["allocated_am"],
+            "unallocated_am": project_data["unallocated_am"],
+            "reasons": reasons
+        })
+
+    yearly_am_totals = {y: state["yearly_totals"][y - first_year] for y in years}
+    allocation = {
+        "yearly_am_totals": yearly_am_totals,
+        "yearly_overages": {y: total - max_yearly_capacity for y, total in yearly_am_totals.items()
+                            if total > max_yearly_capacity},
+        "unallocated_projects": unallocated_projects,
+        "max_yearly_capacity": max_yearly_capacity,
+    }
+    parse_errors = [state["errors"][r] for r in sorted(state["errors"])]
+    return data, years, allocation, parse_errors
+
+def _count_years(state, project_data, step):
+    # Add (step=1) or remove (step=-1) a project's years from the year counts
+    months = project_data["months_in_period"]
+    if not months:
+        return
+    year_rows = state["year_rows"]
+    for y in range(months[0][0], months[-1][0] + 1):
+        year_rows[y] = year_rows.get(y, 0) + step
+        if not year_rows[y]:
+            del year_rows[y]
+
+def _project_years(state):
+    # Years covered by the projects' periods, as read_input reports them
+    return sorted(state["year_rows"])
+
+def _project_span(state, project_data):
+    months_in_period = project_data["months_in_period"]
+    if not months_in_period:
+        return 0
+    first = month_index(*months_in_period[0]) - month_index(state["first_year"], 1)
+    return ((1 << len(months_in_period)) - 1) << first
+
+def _reset_axis(state):
+    # Lay the month axis over the projects' years; previous results are discarded
+    years = _project_years(state)
+    state["first_year"] = years[0] if years else 0
+    state["year_count"] = years[-1] - years[0] + 1 if years else 0
+    state["spans"] = {r: _project_span(state, project_data) for r, project_data in state["projects"].items()}
+    state["taken"] = {}
+    state["year_counts"] = {}
+    state["reason_months"] = {}
+    state["month_owner"] = {}
+    state["reasons"] = {}
+
+def _drop_project(state, r):
+    for offset in _set_bits(state["taken"].pop(r, 0)):
+        if state["month_owner"].get(offset) == r:
+            del state["month_owner"][offset]
+    _count_years(state, state["projects"][r], -1)
+    for key in ("projects", "spans", "year_counts", "reason_months", "reasons"):
+        state[key].pop(r, None)
+
+def _year_masks(months):
+    # Full-year masks of every year in which ``months`` has a bit
+    masks = 0
+    year_offset = 0
+    while months:
+        if months & 0xFFF:
+            masks |= 0xFFF << (year_offset * 12)
+        months >>= 12
+        year_offset += 1
+    return masks
+
+def _replay(state, dirty, forced):
+    # Walk the projects in allocation order, recomputing the forced ones and
+    # those spanning a dirty year; the others re-apply their stored months
+    max_yearly_capacity = state["capacity"]
+    year_count = state["year_count"]
+    base_index = month_index(state["first_year"], 1)
+    projects, spans, taken_by_row = state["projects"], state["spans"], state["taken"]
+    year_counts, month_owner = state["year_counts"], state["month_owner"]
+
+    yearly_totals = [0] * year_count
+    occupied = 0
+    blocked = 0
+    if max_yearly_capacity <= 0:
+        blocked = (1 << (year_count * 12)) - 1
+
+    recomputed = 0
+    for r in state["order"]:
+        span = spans[r]
+        if r not in forced and not span & dirty:
+            taken = taken_by_row[r]
+            occupied |= taken
+            for year_offset, count in year_counts[r]:
+                yearly_totals[year_offset] += count
+                if yearly_totals[year_offset] >= max_yearly_capacity:
+                    blocked |= 0xFFF << (year_offset * 12)
+            continue
+
+        recomputed += 1
+        state["reasons"].pop(r, None)
+        project_data = projects[r]
+        original_am = project_data["original_am"]
+        occupied_before = occupied
+        blocked_before = blocked
+        taken, allocated_count, blocked, blocked_during = _take_months(span, original_am, occupied, blocked,
+                                                                       yearly_totals, max_yearly_capacity)
+        occupied |= taken
+
+        old_taken = taken_by_row.get(r, 0)
+        if taken != old_taken or r in forced:
+            dirty |= _year_masks(taken ^ old_taken)
+            for offset in _set_bits(old_taken & ~taken):
+                if month_owner.get(offset) == r:
+                    del month_owner[offset]
+            allocated_offsets = _set_bits(taken)
+            for offset in allocated_offsets:
+                month_owner[offset] = r
+            taken_by_row[r] = taken
+            year_counts[r] = [(year_offset, bin((taken >> (year_offset * 12)) & 0xFFF).count("1"))
+                              for year_offset in sorted({offset // 12 for offset in allocated_offsets})]
+            allocated_months = [divmod(base_index + offset, 12) for offset in allocated_offsets]
+            project_data["allocated_months"] = [(y, m + 1) for y, m in allocated_months]
+            project_data["allocated_am"] = allocated_count
+            project_data["unallocated_am"] = original_am - allocated_count
+
+        if allocated_count < original_am:
+            capacity_months = span & (blocked_before | blocked_during)
+            state["reason_months"][r] = (capacity_months, span & occupied_before & ~capacity_months)
+        else:
+            state["reason_months"].pop(r, None)
+
+    state["yearly_totals"] = yearly_totals
+    return recomputed
+
+
+def open_input(source, read_only=False):
+    # openpyxl can directly handle paths, UploadedFile objects and byte streams
+    wb = openpyxl.load_workbook(source, read_only=read_only)
+    if read_only:
+        # Read-only sheets stop at the stored <dimension>, which other writers
+        # may leave wrong (e.g. "A1"): read up to the last row actually present
+        for ws in wb.worksheets:
+            ws.reset_dimensions()
+    return wb
+
+def input_column_widths(ws_in):
+    """Return {column letter: width} for the input sheet.
+
+    Read-only worksheets do not expose column_dimensions, so their <cols>
+    element is parsed directly, stopping before the sheet data.
+    """
+    if hasattr(ws_in, "column_dimensions"):
+        return {letter: dim.width for letter, dim in ws_in.column_dimensions.items()}
+
+    widths = {}
+    with ws_in._get_source() as src:
+        for event, element in ElementTree.iterparse(src, events=("start", "end")):
+            tag = element.tag.rsplit("}", 1)[-1]
+            if tag == "sheetData":
+                break
+            if event == "end" and tag == "col" and element.get("width") is not None:
+                letter = openpyxl.utils.get_column_letter(int(element.get("min")))
+                widths[letter] = float(element.get("width"))
+    return widths
+
+def _copy_cv_column_widths(ws_in, cv_sheet):
+    # Copy column dimensions (widths)
+    for col_letter, width in input_column_widths(ws_in).items():
+        cv_sheet.column_dimensions[col_letter].width = width
+
+
+# ------------------------------------------------
+# Καθαρισμός παλιάς περιοχής
+# ------------------------------------------------
+def reset_template(ws):
+    """Clear everything from YEAR_ROW down in the template sheet.
+
+    Unmerges ranges in that area and blanks the value and fill of the cells
+    that already exist (borders and fonts are kept), so the cost scales with
+    the template's content instead of rows x (years x 12) columns. Cells left
+    without any style are dropped so they are not written back out.
+    """
+    # Unmerge any previous cells in header, totals and data rows to prevent conflicts
+    for merged_range in list(ws.merged_cells.ranges): # Iterate over a copy of the list
+        if merged_range.max_row >= YEAR_ROW:
+            ws.unmerge_cells(merged_range.coord)
+
+    # ws._cells only holds materialized cells; ws.cell() would create new ones
+    for (r_clear, c_clear), cell in list(ws._cells.items()):
+        if r_clear < YEAR_ROW:
+            continue
+        cell.value = None
+        if cell.fill.fill_type is not None:
+            cell.fill = no_fill # Also clear fill
+        if not cell.has_style:
+            del ws._cells[(r_clear, c_clear)]
+
+
+# ------------------------------------------------
+# Shared styles
+# ------------------------------------------------
+# Every style the renderers write, by name: (font, fill, border, alignment).
+# They are interned once per output workbook and cells are styled by index.
+center_alignment = Alignment(horizontal='center', vertical='center')
+NAMED_STYLES = {
+    "bordered": (None, None, thin_border, None),
+    "allocated": (None, yellow, thin_border, None),
+    "total_label": (bold_font, None, thin_border, None),
+    "am": (black_font, None, thin_border, None),
+    "am_unallocated": (red_bold_font, None, thin_border, None), # Original AM not fully allocated
+    "year_full": (white_bold_font, red_fill, thin_border, None), # Yearly capacity reached
+    "total_full": (white_bold_font, red_fill, thin_border, center_alignment),
+    "total_partial": (black_bold_font, green_fill, thin_border, center_alignment), # Under capacity but allocated
+    "total_empty": (bold_font, None, thin_border, center_alignment),
+}
+
+# Year header colours, picked by year so the same year always gets the same colour
+YEAR_PALETTE = ["1F4E79", "2E75B6", "9DC3E6", "548235", "A9D18E", "7030A0",
+                "C9A0DC", "BF8F00", "FFD966", "C55A11", "F4B183", "3B3838"]
+
+for _i, _color in enumerate(YEAR_PALETTE):
+    NAMED_STYLES[f"year_{_i}"] = (black_font if is_light_color(_color) else white_font, # Text readable on the fill
+                                  PatternFill(start_color=_color, end_color=_color, fill_type="solid"),
+                                  thin_border, None)
+
+def year_style(year):
+    return f"year_{year % len(YEAR_PALETTE)}"
+
+def _style_ids(wb, font=None, fill=None, border=None, alignment=None, number_format=None):
+    # Add the given style objects to the workbook's style tables and return
+    # {StyleArray field: index} for the attributes that were given
+    ids = {}
+    if font is not None:
+        ids["fontId"] = wb._fonts.add(font)
+    if fill is not None:
+        ids["fillId"] = wb._fills.add(fill)
+    if border is not None:
+        ids["borderId"] = wb._borders.add(border)
+    if alignment is not None:
+        ids["alignmentId"] = wb._alignments.add(alignment)
+    if number_format is not None:
+        if number_format in BUILTIN_FORMATS_REVERSE:
+            ids["numFmtId"] = BUILTIN_FORMATS_REVERSE[number_format]
+        else:
+            ids["numFmtId"] = wb._number_formats.add(number_format) + BUILTIN_FORMATS_MAX_SIZE
+    return ids
+
+def new_style_registry(wb):
+    """Intern NAMED_STYLES in ``wb`` and return the registry used to apply them.
+
+    Style objects are hashed once here; afterwards cells are styled by
+    copying integer style indexes, for regular and write-only sheets alike.
+    """
+    ids = {name: _style_ids(wb, *style) for name, style in NAMED_STYLES.items()}
+    arrays = {}
+    for name, style_ids in ids.items():
+        style = StyleArray()
+        for field, index in style_ids.items():
+            setattr(style, field, index)
+        arrays[name] = style
+    return {"wb": wb, "ids": ids, "arrays": arrays, "overlays": {}, "copies": {}, "merged": {}}
+
+def overlay_style(registry, current, name):
+    # Return ``current`` with the named style's font/fill/border/alignment set,
+    # keeping whatever else the template gave it (e.g. number format)
+    current = current or () # New cells have no style array yet
+    key = (tuple(current), name)
+    style = registry["overlays"].get(key)
+    if style is None:
+        style = StyleArray(current) if current else StyleArray()
+        for field, index in registry["ids"][name].items():
+            setattr(style, field, index)
+        registry["overlays"][key] = style
+    return style
+
+def apply_style(registry, cell, name):
+    # Set the named style on an existing cell
+    cell._style = StyleArray(overlay_style(registry, cell._style, name)) # Cells own their style array
+
+def styled_cell(ws, registry, value=None, name=None):
+    # Write-only cell carrying a named style (plain values need no cell)
+    if name is None:
+        return value
+    return Cell(ws, row=1, column=1, value=value, style_array=registry["arrays"][name])
+
+def copied_style(registry, cell):
+    """Return the StyleArray reproducing ``cell``'s style in the registry's workbook.
+
+    Font, fill, border, alignment and number format are mapped from the source
+    workbook's style tables once per distinct source style, so copying a
+    sheet costs a dictionary lookup per cell.
+    """
+    source = cell.style_array if hasattr(cell, "style_array") else cell._style
+    source_wb = cell.parent.parent
+    key = (id(source_wb), tuple(source))
+    style = registry["copies"].get(key)
+    if style is None:
+        style = StyleArray()
+        number_format = cell.number_format
+        for field, index in _style_ids(registry["wb"],
+                                       source_wb._fonts[source.fontId],
+                                       source_wb._fills[source.fillId],
+                                       source_wb._borders[source.borderId],
+                                       source_wb._alignments[source.alignmentId],
+                                       number_format).items():
+            setattr(style, field, index)
+        registry["copies"][key] = style
+    return style
+
+def merged_cell_style(registry, start, last):
+    """Return the StyleArray merge_cells leaves on a covered cell of a one-row range.
+
+    Covered cells take the start cell's (``start``) top and bottom borders,
+    and the last one its right border too; None means the cell stays unstyled.
+    """
+    key = (tuple(start or ()), last)
+    if key not in registry["merged"]:
+        start_border = registry["wb"]._borders[start.borderId] if start else Border()
+        border = Border()
+        for name in ("top", "right", "bottom") if last else ("top", "bottom"):
+            side = getattr(start_border, name)
+            if side and side.style is None:
+                continue # Same rule as MergedCellRange.format
+            border += Border(**{name: side})
+        style = None
+        if border != Border():
+            style = StyleArray()
+            style.borderId = registry["wb"]._borders.add(border)
+        registry["merged"][key] = style
+    return registry["merged"][key]
+
+def template_layout(registry, template_ws):
+    """Clear ``template_ws`` and return what the write-only renderers keep of it.
+
+    ``cells`` maps row -> {column: (value, StyleArray)} for every cell left
+    after reset_template (row 1 with its values, the styled, empty cells
+    below it), with styles already mapped into the registry's workbook.
+    ``widths`` holds the template's column widths by column index.
+    """
+    reset_template(template_ws)
+    cells = {}
+    for (r, c), cell in sorted(template_ws._cells.items()):
+        cells.setdefault(r, {})[c] = (cell.value, copied_style(registry, cell) if cell.has_style else None)
+
+    widths = {}
+    for dim in list(template_ws.column_dimensions.values()):
+        for c_width in range(dim.min or 1, (dim.max or dim.min or 1) + 1):
+            if dim.width:
+                widths[c_width] = dim.width
+    return {"cells": cells, "widths": widths}
+
+
+# ------------------------------------------------
+# Rendering
+# ------------------------------------------------
+def render_workbook(template_source, ws_in, data, years, allocation):
+    """Build the output workbook (ΑΝΑΛΥΣΗ + CV sheets) from the template.
+
+    ``template_source`` may be a Workbook (used and modified in place), a
+    path or a file-like object.
+    """
+    max_yearly_capacity = allocation["max_yearly_capacity"]
+    yearly_am_totals = allocation["yearly_am_totals"]
+
+    # ------------------------------------------------
+    # Ανοίγουμε TEMPLATE
+    # ------------------------------------------------
+    wb = load_template(template_source)
+    ws = wb.active
+    styles = new_style_registry(wb)
+
+    # Freeze the first 3 columns (A, B, C) - this means the freeze point is at D1
+    ws.freeze_panes = 'D1'
+
+    # ------------------------------------------------
+    # Καθαρισμός παλιάς περιοχής
+    # ------------------------------------------------
+    reset_template(ws)
+
+    # ------------------------------------------------
+    # Χτίσιμο ετών & μηνών
+    # ------------------------------------------------
+    col = START_COL
+    month_col_map = {}
+
+    for y in years:
+        year_start_col = col # Store the starting column for this year
+        year_header_cell = ws.cell(YEAR_ROW, col) # Get the cell where year will be displayed
+
+        # Palette fill (with a readable font) on the merged year cell
+        apply_style(styles, year_header_cell, year_style(y))
+
+        for m in range(1,13):
+            month_cell = ws.cell(MONTH_ROW, col)
+            month_cell.value = m
+            apply_style(styles, month_cell, "bordered")
+            month_col_map[(y,m)] = col
+            col += 1
+        year_end_col = col - 1 # The last column for this year (12 months)
+
+        # Merge cells for the current year
+        ws.merge_cells(start_row=YEAR_ROW, start_column=year_start_col, end_row=YEAR_ROW, end_column=year_end_col)
+        year_header_cell.value = y # Year will be written in the first cell of the merged block
+
+        # Apply borders to the rest of the merged year header
+        for c_border in range(year_start_col + 1, col):
+            apply_style(styles, ws.cell(YEAR_ROW, c_border), "bordered")
+
+    # Add headers for the yearly total row
+    ws.cell(YEARLY_TOTAL_ROW, 2).value = "ΕΤΗΣΙΑ ΣΥΝΟΛΑ"
+    apply_style(styles, ws.cell(YEARLY_TOTAL_ROW, 2), "total_label")
+
+    # ------------------------------------------------
+    # Γραμμές & μπάρες
+    # ------------------------------------------------
+    row = START_ROW_DATA + 2 # Data starts from the new START_ROW_DATA + 2 (after yearly totals row)
+
+    for project_data in data:
+        # Apply borders to columns B and C for current data row
+        ws.cell(row,2).value = project_data["period_str"]
+        apply_style(styles, ws.cell(row,2), "bordered")
+        ws.cell(row,3).value = project_data["original_am"]
+
+        # Highlight the original AM if not fully allocated (e.g., red text)
+        apply_style(styles, ws.cell(row, 3), "am_unallocated" if project_data["unallocated_am"] > 0 else "am")
+
+        # Apply borders to all month columns for the current data row (even if no allocation happened)
+        for c_border in range(START_COL, col):
+            apply_style(styles, ws.cell(row, c_border), "bordered")
+
+        for (y, m) in project_data["allocated_months"]:
+            cell_to_fill = ws.cell(row, month_col_map[(y,m)])
+            cell_to_fill.value = 'X' # Mark allocation
+            apply_style(styles, cell_to_fill, "allocated")
+
+        row += 1
+
+    # Populate and style the YEARLY_TOTAL_ROW
+    for y in years:
+        if y in yearly_am_totals:
+            # Merge the yearly total over the year's 12 month columns
+            year_start_col = month_col_map[(y, 1)]
+            year_end_col = month_col_map[(y, 12)]
+            ws.merge_cells(start_row=YEARLY_TOTAL_ROW, start_column=year_start_col, end_row=YEARLY_TOTAL_ROW, end_column=year_end_col)
+
+            total_cell = ws.cell(YEARLY_TOTAL_ROW, year_start_col)
+            total_cell.value = yearly_am_totals[y]
+
+            # Highlight if yearly total meets or exceeds capacity
+            if yearly_am_totals[y] >= max_yearly_capacity:
+                # Apply to the merged year header cell (first column of the year)
+                apply_style(styles, ws.cell(YEAR_ROW, year_start_col), "year_full")
+                apply_style(styles, total_cell, "total_full")
+            elif yearly_am_totals[y] > 0:
+                apply_style(styles, total_cell, "total_partial")
+            else:
+                apply_style(styles, total_cell, "total_empty")
+
+    # Set fixed width for month columns after all content has been added
+    for c_width in range(START_COL, col):
+        ws.column_dimensions[openpyxl.utils.get_column_letter(c_width)].width = 2.5
+
+    # Rename the active worksheet to 'ΑΝΑΛΥΣΗ'
+    ws.title = 'ΑΝΑΛΥΣΗ'
+
+    # Create a new sheet named 'CV' and copy content from ws_in
+    cv_sheet = wb.create_sheet(title='CV', index=0) # Add as the first sheet
+    for row_idx, row_data in enumerate(ws_in.iter_rows()):
+        for col_idx, cell in enumerate(row_data):
+            new_cell = cv_sheet.cell(row=row_idx + 1, column=col_idx + 1, value=cell.value)
+            # Copy styles (fills, fonts, borders, number format) by style index;
+            # read-only sheets fill blank cells with EmptyCell, which has no style
+            if getattr(cell, "has_style", False):
+                new_cell._style = StyleArray(copied_style(styles, cell))
+
+    _copy_cv_column_widths(ws_in, cv_sheet)
+
+    # Add the formula to cell A6 of the 'ΑΝΑΛΥΣΗ' sheet
+    ws['A6'] = MATCH_FORMULA
+
+    return wb
+
+
+def _write_rows(ws):
+    # WriteOnlyWorksheet._write_rows that also takes prebuilt <row> elements,
+    # sent with ws._rows.send(); lists still go through openpyxl's row writer
+    xf = ws._writer.xf.send(True)
+    with xf.element("sheetData"):
+        row_idx = 1
+        try:
+            while True:
+                row = (yield)
+                if isinstance(row, (list, tuple)):
+                    ws._writer.write_row(xf, ws._values_to_row(row, row_idx), row_idx)
+                else:
+                    xf.write(row)
+                row_idx += 1
+        except GeneratorExit:
+            pass
+    ws._writer.xf.send(None)
+
+def stream_rows(ws):
+    """Let the empty write-only sheet ``ws`` also take prebuilt <row> elements.
+
+    Returns a function appending one such element. ws.append keeps working
+    for ordinary rows, interleaved with them.
+    """
+    if ws._rows is not None:
+        raise ValueError("Rows were already written to this sheet")
+    ws._get_writer()
+    ws._rows = _write_rows(ws)
+    next(ws._rows)
+    return ws._rows.send
+
+def write_analysis_sheet(ws, styles, layout, data, years, allocation):
+    """Write the ΑΝΑΛΥΣΗ layout for ``data`` into the empty write-only sheet ``ws``.
+
+    ``styles`` is the workbook's style registry and ``layout`` the cleared
+    template from template_layout. Cells come out as render_workbook leaves
+    them: template borders and fonts under the named styles, merged-cell
+    borders on the year and total rows, and the MATCH formula in A6.
+    """
+    max_yearly_capacity = allocation["max_yearly_capacity"]
+    yearly_am_totals = allocation["yearly_am_totals"]
+    template_cells = layout["cells"]
+
+    # Month columns for every year, in order
+    month_col_map = {}
+    col = START_COL
+    for y in years:
+        for m in range(1, 13):
+            month_col_map[(y, m)] = col
+            col += 1
+    last_col = col - 1
+    month_cols = range(START_COL, last_col + 1)
+
+    # Column widths must be set before any row is written: keep the template's
+    # widths outside the month area and the fixed 2.5 width for month columns
+    for c_width, width in layout["widths"].items():
+        if not START_COL <= c_width <= last_col:
+            ws.column_dimensions[openpyxl.utils.get_column_letter(c_width)].width = width
+    for c_width in month_cols:
+        ws.column_dimensions[openpyxl.utils.get_column_letter(c_width)].width = 2.5
+
+    # Freeze the first 3 columns (A, B, C) - this means the freeze point is at D1
+    ws.freeze_panes = 'D1'
+    append_row = stream_rows(ws)
+
+    def base(r, c):
+        # Style the cleared template left on (r, c), if any
+        return template_cells.get(r, {}).get(c, (None, None))[1]
+
+    cell_styles = ws.parent._cell_styles
+    style_ids = {} # StyleArray -> the sheet's "s" attribute
+    letters = {}
+    written = [] # etree_write_cell "writes" a valued cell here
+    cell_sink = types.SimpleNamespace(write=written.append)
+
+    def cell_xml(r, c, value, style):
+        # XML of one cell, as openpyxl's writer would produce it
+        letter = letters.get(c) or letters.setdefault(c, openpyxl.utils.get_column_letter(c))
+        styled = bool(style) and any(style)
+        if value is None:
+            if not styled:
+                return ""
+            key = tuple(style)
+            style_id = style_ids.get(key) or style_ids.setdefault(key, str(cell_styles.add(StyleArray(style))))
+            return f'<c r="{letter}{r}" s="{style_id}"/>'
+        etree_write_cell(cell_sink, ws, Cell(ws, row=r, column=c, value=value, style_array=style if styled else None), styled)
+        return tostring(written.pop(), encoding="unicode")
+
+    def emit(r, cells):
+        # Append row r: the template's cells overlaid with ``cells`` ({column: (value, style)})
+        row_cells = dict(template_cells.get(r, {}))
+        row_cells.update(cells)
+        append_row(fromstring(f'<row r="{r}">' + "".join(cell_xml(r, c, value, style)
+                                                          for c, (value, style) in sorted(row_cells.items())) + '</row>'))
+
+    emit(1, {})
+
+    # ------------------------------------------------
+    # Χτίσιμο ετών & μηνών
+    # ------------------------------------------------
+    year_cells = {}
+    month_cells = {}
+    total_cells = {2: ("ΕΤΗΣΙΑ ΣΥΝΟΛΑ", overlay_style(styles, base(YEARLY_TOTAL_ROW, 2), "total_label"))}
+
+    for y in years:
+        year_start_col = month_col_map[(y, 1)]
+        year_end_col = month_col_map[(y, 12)]
+
+        # Palette fill (with a readable font) on the merged year cell
+        year_style_array = overlay_style(styles, base(YEAR_ROW, year_start_col), year_style(y))
+        for c in range(year_start_col + 1, year_end_col + 1):
+            year_cells[c] = (None, overlay_style(styles, None, "bordered")) # Covered cells only keep the border
+        for m in range(1, 13):
+            c = month_col_map[(y, m)]
+            month_cells[c] = (m, overlay_style(styles, base(MONTH_ROW, c), "bordered"))
+        ws.merged_cells.add(openpyxl.worksheet.cell_range.CellRange(
+            min_col=year_start_col, min_row=YEAR_ROW, max_col=year_end_col, max_row=YEAR_ROW))
+
+        if y in yearly_am_totals:
+            total_am = yearly_am_totals[y]
+            start = base(YEARLY_TOTAL_ROW, year_start_col)
+            # Highlight if yearly total meets or exceeds capacity
+            if total_am >= max_yearly_capacity:
+                year_style_array = overlay_style(styles, year_style_array, "year_full")
+                total_name = "total_full"
+            elif total_am > 0:
+                total_name = "total_partial" # Green for under capacity but allocated
+            else:
+                total_name = "total_empty"
+            total_cells[year_start_col] = (total_am, overlay_style(styles, start, total_name))
+            for c in range(year_start_col + 1, year_end_col + 1):
+                total_cells[c] = (None, merged_cell_style(styles, start, c == year_end_col))
+            ws.merged_cells.add(openpyxl.worksheet.cell_range.CellRange(
+                min_col=year_start_col, min_row=YEARLY_TOTAL_ROW, max_col=year_end_col, max_row=YEARLY_TOTAL_ROW))
+
+        year_cells[year_start_col] = (y, year_style_array)
+
+    emit(YEAR_ROW, year_cells)
+    emit(MONTH_ROW, month_cells)
+    emit(START_ROW_DATA, {}) # START_ROW_DATA keeps only the template's cells
+    emit(YEARLY_TOTAL_ROW, total_cells)
+
+    # ------------------------------------------------
+    # Γραμμές & μπάρες
+    # ------------------------------------------------
+    # Rows past the template only differ in their values and allocated months:
+    # their month cells are spliced from per-column XML built once per sheet
+    blank_style = overlay_style(styles, None, "bordered")
+    allocated_style = overlay_style(styles, blank_style, "allocated")
+    blank_months = [cell_xml("{r}", c, None, blank_style) for c in month_cols]
+    allocated_months = {c: cell_xml("{r}", c, 'X', allocated_style) for c in month_cols}
+
+    first_row = YEARLY_TOTAL_ROW + 1
+    last_row = max(first_row + len(data) - 1, max(template_cells, default=0), first_row) # A6 always gets the formula
+    for r in range(first_row, last_row + 1):
+        project_data = data[r - first_row] if r - first_row < len(data) else None
+        if project_data is not None:
+            # Highlight the original AM if not fully allocated (e.g., red text)
+            am_name = "am_unallocated" if project_data["unallocated_am"] > 0 else "am"
+            allocated = {month_col_map[ym] for ym in project_data["allocated_months"]}
+
+        if r in template_cells or r == first_row:
+            cells = {}
+            if r == first_row:
+                cells[1] = (MATCH_FORMULA, base(r, 1))
+            if project_data is not None:
+                cells[2] = (project_data["period_str"], overlay_style(styles, base(r, 2), "bordered"))
+                cells[3] = (project_data["original_am"], overlay_style(styles, base(r, 3), am_name))
+                for c in month_cols:
+                    cells[c] = (None, overlay_style(styles, base(r, c), "bordered"))
+                for c in allocated:
+                    cells[c] = ('X', overlay_style(styles, cells[c][1], "allocated")) # Mark allocation
+            emit(r, cells)
+            continue
+
+        month_cells = blank_months[:]
+        for c in allocated:
+            month_cells[c - START_COL] = allocated_months[c] # Mark allocation
+        append_row(fromstring(f'<row r="{r}">'
+                              + cell_xml(r, 2, project_data["period_str"], styles["arrays"]["bordered"])
+                              + cell_xml(r, 3, project_data["original_am"], styles["arrays"][am_name])
+                              + "".join(month_cells).replace("{r}", str(r)) + '</row>'))
+
+def new_output_workbook(template_ws):
+    # Write-only workbook with the template's default font (used by unstyled
+    # cells), theme and custom document properties (its sensitivity label)
+    template_wb = template_ws.parent
+    wb = openpyxl.Workbook(write_only=True)
+    wb._fonts = IndexedList([template_wb._fonts[0]])
+    wb.loaded_theme = template_wb.loaded_theme
+    wb.custom_doc_props = template_wb.custom_doc_props
+    return wb
+
+def render_workbook_streaming(template_source, ws_in, data, years, allocation):
+    """Build the same ΑΝΑΛΥΣΗ + CV workbook with write-only sheets.
+
+    Rows are emitted in order straight to the XLSX stream, so memory and
+    time grow linearly with the number of projects. The template is only
+    read for its cleared cells and column widths; the header, merges,
+    fills and freeze panes are produced exactly as render_workbook lays
+    them out.
+    """
+    template_ws = load_template(template_source).active
+
+    wb = new_output_workbook(template_ws)
+    styles = new_style_registry(wb) # Shared by both sheets: style tables are per workbook
+    cv_sheet = wb.create_sheet(title='CV')
+    ws = wb.create_sheet(title='ΑΝΑΛΥΣΗ')
+
+    write_analysis_sheet(ws, styles, template_layout(styles, template_ws), data, years, allocation)
+
+    # ------------------------------------------------
+    # CV sheet
+    # ------------------------------------------------
+    _copy_cv_column_widths(ws_in, cv_sheet)
+    for row_data in ws_in.iter_rows():
+        # Copy styles (fills, fonts, borders, number format) by style index; EmptyCell has none
+        cv_sheet.append([Cell(cv_sheet, row=1, column=1, value=cell.value, style_array=copied_style(styles, cell))
+                         if getattr(cell, "has_style", False) else cell.value
+                         for cell in row_data])
+
+    return wb
+
+def render(template_source, ws_in, data, years, allocation, streaming=None):
+    """Render with the write-only renderer for large inputs, else the template renderer.
+
+    ``streaming=None`` picks automatically from STREAMING_ROW_THRESHOLD.
+    """
+    if streaming is None:
+        streaming = len(data) >= STREAMING_ROW_THRESHOLD
+    if streaming:
+        return render_workbook_streaming(template_source, ws_in, data, years, allocation)
+    return render_workbook(template_source, ws_in, data, years, allocation)
+
+
+# ------------------------------------------------
+# Summary tables
+# ------------------------------------------------
+def yearly_summary_rows(allocation):
+    # One row per year: allocated AM against the yearly capacity
+    max_yearly_capacity = allocation["max_yearly_capacity"]
+    yearly_overages = allocation["yearly_overages"]
+    rows = []
+    for year, total_am in sorted(allocation["yearly_am_totals"].items()):
+        status = "Capacity Reached" if total_am >= max_yearly_capacity else ""
+        if year in yearly_overages: # Check if there was an actual overage
+            status = f"OVER CAPACITY by {yearly_overages[year]}"
+        rows.append({"Year": year, "Allocated AM": total_am, "Capacity": max_yearly_capacity, "Status": status})
+    return rows
+
+def unallocated_summary_rows(allocation):
+    # One row per project with unallocated person-months
+    return [{
+        "Period": str(proj["period"]), # Date cells and text share one column
+        "Original AM": proj["original_am"],
+        "Allocated AM": proj["allocated_am"],
+        "Unallocated AM": proj["unallocated_am"],
+        "Reasons": proj["reasons"],
+    } for proj in allocation["unallocated_projects"]]
+
+def rows_to_csv(rows):
+    """Return table rows (dicts with the same keys) as CSV text."""
+    buffer = io.StringIO()
+    if rows:
+        writer = csv.DictWriter(buffer, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    return buffer.getvalue()
+
+
+# ------------------------------------------------
+# Headless pipeline
+# ------------------------------------------------
+def process_file(input_path, output_dir, template_source=TEMPLATE_PATH, max_yearly_capacity=MAX_YEARLY_CAPACITY,
+                 streaming=None, mode=GREEDY, with_diagnostics=None):
+    """Run the full pipeline for one input file and write the output workbook.
+
+    The input is always read in read-only mode; ``streaming`` selects the
+    renderer (see render) and ``mode`` the allocator (see allocate). Returns a summary dict suitable for logging or
+    tabulating batch runs. ``with_diagnostics`` (default: the AM_DIAGNOSTICS
+    environment switch) adds a per-phase report under "diagnostics".
+    """
+    report = diagnostics.new_report(with_diagnostics, file=os.path.basename(input_path), mode=mode)
+
+    try:
+        with diagnostics.phase(report, "load"):
+            wb_in = open_input(input_path, read_only=True)
+        try:
+            ws_in = wb_in.active
+
+            with diagnostics.phase(report, "parse") as counts:
+                data, years, parse_errors = read_input(ws_in)
+                counts.update(projects=len(data), parse_errors=len(parse_errors))
+            with diagnostics.phase(report, "allocation", projects=len(data), years=len(years)):
+                allocation = allocate(data, years, max_yearly_capacity, mode)
+            with diagnostics.phase(report, "template"):
+                template_wb = load_template(template_source)
+            with diagnostics.phase(report, "render", grid_cells=len(data) * len(years) * 12):
+                wb = render(template_wb, ws_in, data, years, allocation, streaming)
+
+            output_path = os.path.join(output_dir, output_filename(input_path))
+            with diagnostics.phase(report, "save"):
+                wb.save(output_path)
+        finally:
+            wb_in.close() # Release the file handle held by the read-only workbook
+    finally:
+        diagnostics.finish(report) # Also when the pipeline fails
+
+    return {
+        "input": input_path,
+        "output": output_path,
+        "projects": len(data),
+        "allocated_am": sum(p["allocated_am"] for p in data),
+        "unallocated_am": sum(p["unallocated_am"] for p in data),
+        "parse_errors": parse_errors,
+        "diagnostics": report,
+    }
@@ -0,0 +1,86 @@
+"""Maximum flow (Dinic's algorithm) on a flat residual graph.
+
+Edges are stored in parallel lists; edge ``e`` and its reverse ``e ^ 1``
+are added together, so flow on an edge is the capacity of its reverse.
+"""
+
+
+def new_graph(node_count):
+    return {"adj": [[] for _ in range(node_count)], "to": [], "cap": []}
+
+
+def add_edge(graph, u, v, capacity):
+    # Add u -> v with the given capacity and its empty reverse edge
+    to, cap = graph["to"], graph["cap"]
+    e = len(to)
+    graph["adj"][u].append(e)
+    to.append(v)
+    cap.append(capacity)
+    graph["adj"][v].append(e + 1)
+    to.append(u)
+    cap.append(0)
+    return e
+
+
+def max_flow(graph, source, sink):
+    """Augment the graph's current flow to a maximum one; return the flow added."""
+    adj, to, cap = graph["adj"], graph["to"], graph["cap"]
+    node_count = len(adj)
+    total = 0
+
+    while True:
+        # BFS: level graph over edges with residual capacity
+        level = [-1] * node_count
+        level[source] = 0
+        queue = [source]
+        for u in queue:
+            next_level = level[u] + 1
+            for e in adj[u]:
+                v = to[e]
+                if cap[e] and level[v] < 0:
+                    level[v] = next_level
+                    queue.append(v)
+        if level[sink] < 0:
+            return total
+
+        # Iterative DFS: blocking flow along level-increasing edges
+        pointer = [0] * node_count
+        stack = [source]
+        path = []
+        while stack:
+            u = stack[-1]
+            if u == sink:
+                pushed = min(cap[e] for e in path)
+                for e in path:
+                    cap[e] -= pushed
+                    cap[e ^ 1] += pushed
+                total += pushed
+                # Retreat to the tail of the first saturated edge
+                for i, e in enumerate(path):
+                    if not cap[e]:
+                        del stack[i + 1:]
+                        del path[i:]
+                        break
+                continue
+
+            edges = adj[u]
+            i = pointer[u]
+            next_level = level[u] + 1
+            while i < len(edges):
+                e = edges[i]
+                if cap[e] and level[to[e]] == next_level:
+                    break
+                i += 1
+            pointer[u] = i
+
+            if i < len(edges):
+                e = edges[i]
+                stack.append(to[e])
+                path.append(e)
+            else:
+                # Dead end: drop u from this phase and step back
+                level[u] = -1
+                stack.pop()
+                if path:
+                    path.pop()
+                    pointer[stack[-1]] += 1
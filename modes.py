@@ -0,0 +1,8 @@
+"""Allocation modes, importable without openpyxl.
+
+engine re-exports these; the app's landing page reads them from here so
+it renders before any of the processing modules are loaded.
+"""
+GREEDY = "greedy" # Shortest projects first, earliest free months first
+MAX_FLOW = "max-flow" # Maximum feasible allocation (see engine.allocate_max_flow)
+ALLOCATION_MODES = (GREEDY, MAX_FLOW)
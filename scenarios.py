@@ -0,0 +1,96 @@
+"""What-if scenarios: many (capacity, ordering) allocations over one parsed input."""
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+import engine
+
+# Parsed input shared with each worker process once, through the pool initializer
+_worker_input = {}
+
+
+def _init_worker(data, years):
+    _worker_input["data"] = data
+    _worker_input["years"] = years
+
+
+def _copy_projects(data):
+    # allocate() sorts the list and writes allocation fields into each project,
+    # so every scenario gets its own shallow copies (period months are shared)
+    return [dict(project_data) for project_data in data]
+
+
+def run_scenario(data, years, capacity, ordering=engine.SHORTEST_FIRST, mode=engine.GREEDY):
+    """Allocate one scenario on a copy of ``data`` and summarize it per year.
+
+    Unallocated AM is spread over the years of each project's period in
+    proportion to its months there, so yearly figures add up to the total.
+    """
+    projects = _copy_projects(data)
+    allocation = engine.allocate(projects, years, capacity, mode, ordering)
+
+    yearly_unallocated = {y: 0.0 for y in years}
+    for project_data in projects:
+        if project_data["unallocated_am"] <= 0 or not project_data["months_in_period"]:
+            continue
+        share = project_data["unallocated_am"] / project_data["months_in_period_count"]
+        for (y, m) in project_data["months_in_period"]:
+            yearly_unallocated[y] += share
+
+    return {
+        "capacity": capacity,
+        "ordering": ordering,
+        "mode": mode,
+        "allocated_am": sum(p["allocated_am"] for p in projects),
+        "unallocated_am": sum(max(p["unallocated_am"], 0) for p in projects),
+        "unallocated_projects": len(allocation["unallocated_projects"]),
+        "yearly_allocated": allocation["yearly_am_totals"],
+        "yearly_unallocated": {y: round(total, 1) for y, total in yearly_unallocated.items()},
+    }
+
+
+def _run_in_worker(capacity, ordering, mode):
+    return run_scenario(_worker_input["data"], _worker_input["years"], capacity, ordering, mode)
+
+
+def run_scenarios(data, years, capacities, orderings, mode=engine.GREEDY, max_workers=None):
+    """Run every (capacity, ordering) combination and return their summaries.
+
+    The parsed ``data`` is sent to each worker process once; scenarios then
+    run concurrently. ``max_workers=1`` runs them in-process. Results keep
+    the order of ``itertools.product(capacities, orderings)``.
+    """
+    combinations = list(itertools.product(capacities, orderings))
+    for _, ordering in combinations:
+        if ordering not in engine.ORDERINGS:
+            raise ValueError(f"Unknown ordering: '{ordering}'. Expected one of {', '.join(engine.ORDERINGS)}.")
+
+    if max_workers == 1 or len(combinations) <= 1:
+        return [run_scenario(data, years, capacity, ordering, mode) for capacity, ordering in combinations]
+
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(data, years)) as pool:
+        futures = [pool.submit(_run_in_worker, capacity, ordering, mode) for capacity, ordering in combinations]
+        return [future.result() for future in futures]
+
+
+def comparison_rows(results, years):
+    """Flatten scenario summaries into table rows, one per scenario.
+
+    Each row has the scenario, its totals and "<year> allocated" /
+    "<year> unallocated" columns.
+    """
+    rows = []
+    for result in results:
+        row = {
+            "Scenario": f"cap {result['capacity']} / {result['ordering']}",
+            "Capacity": result["capacity"],
+            "Ordering": result["ordering"],
+            "Mode": result["mode"],
+            "Allocated AM": result["allocated_am"],
+            "Unallocated AM": result["unallocated_am"],
+            "Projects with unallocated AM": result["unallocated_projects"],
+        }
+        for y in years:
+            row[f"{y} allocated"] = result["yearly_allocated"].get(y, 0)
+            row[f"{y} unallocated"] = result["yearly_unallocated"].get(y, 0.0)
+        rows.append(row)
+    return rows
@@ -0,0 +1,257 @@
+"""Local HTTP service for the person-months allocation.
+
+Endpoints:
+  GET  /health     status, template version, workers and slots in use
+  POST /allocate   allocation as JSON
+  POST /workbook   rendered ΑΝΑΛΥΣΗ + CV workbook (.xlsx)
+
+POST bodies are either an input workbook (any non-JSON content type) or
+JSON: a list of [period, am] pairs or {"period", "am"} objects, or an
+object with such a list under "rows". ``mode``, ``capacity`` and
+``ordering`` are read from the query string or the JSON object.
+
+Requests run on a bounded process pool whose workers hold a pre-loaded
+template; at most ``--queue`` requests wait for a worker, later ones get
+503 with Retry-After. A request that times out gets 504, but its job
+keeps its slot until the worker finishes it.
+"""
+import argparse
+import hashlib # Import hashlib to version the bundled template
+import io # Import io to handle byte streams
+import json
+import sys
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlparse
+
+from openpyxl.utils.exceptions import InvalidFileException
+
+import batch # Worker initializer holding the template snapshot
+import engine
+
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+MAX_BODY_BYTES = 20 * 2**20 # Largest accepted request body
+DEFAULT_PORT = 8765
+
+
+def _ping():
+    return True
+
+
+def _run_job(body, is_json, capacity, mode, ordering, want_workbook):
+    # Runs in a worker: parse, allocate and either render or summarize
+    if is_json:
+        ws_in = engine.rows_worksheet(body)
+        wb_in = None
+    else:
+        wb_in = engine.open_input(io.BytesIO(body), read_only=True)
+        ws_in = wb_in.active
+    try:
+        data, years, parse_errors = engine.read_input(ws_in)
+        allocation = engine.allocate(data, years, capacity, mode, ordering)
+
+        if want_workbook:
+            template_wb = engine.clone_template(batch._worker_template["snapshot"])
+            wb = engine.render(template_wb, ws_in, data, years, allocation)
+            output_buffer = io.BytesIO()
+            wb.save(output_buffer)
+            return output_buffer.getvalue()
+    finally:
+        if wb_in is not None:
+            wb_in.close() # Release the read-only workbook's buffer
+
+    return {
+        "mode": mode,
+        "ordering": ordering,
+        "max_yearly_capacity": allocation["max_yearly_capacity"],
+        "years": years,
+        "allocated_am": sum(p["allocated_am"] for p in data),
+        "unallocated_am": sum(p["unallocated_am"] for p in data),
+        "yearly_am_totals": {str(y): total for y, total in allocation["yearly_am_totals"].items()},
+        "yearly_overages": {str(y): over for y, over in allocation["yearly_overages"].items()},
+        "projects": [{
+            "project_id": p["project_id"],
+            "period": str(p["period_str"]),
+            "original_am": p["original_am"],
+            "allocated_am": p["allocated_am"],
+            "unallocated_am": p["unallocated_am"],
+            "allocated_months": [f"{y}-{m:02d}" for y, m in p["allocated_months"]],
+        } for p in sorted(data, key=lambda p: p["project_id"])],
+        "unallocated_projects": [dict(proj, period=str(proj["period"])) for proj in allocation["unallocated_projects"]],
+        "parse_errors": parse_errors,
+    }
+
+
+def parse_json_rows(payload):
+    """Return [(period, am)] from a decoded JSON body and the options it carries."""
+    options = {}
+    if isinstance(payload, dict):
+        options = {key: payload[key] for key in ("mode", "capacity", "ordering") if key in payload}
+        payload = payload.get("rows")
+    if not isinstance(payload, list):
+        raise ValueError('Expected a list of [period, am] pairs or {"period", "am"} objects.')
+    rows = []
+    for item in payload:
+        if isinstance(item, dict):
+            rows.append((item.get("period"), item.get("am")))
+        elif isinstance(item, (list, tuple)) and len(item) == 2:
+            rows.append((item[0], item[1]))
+        else:
+            raise ValueError(f"Invalid row: {item!r}. Expected [period, am] or {{\"period\", \"am\"}}.")
+    return rows, options
+
+
+def new_service(template_snapshot, template_version, workers=2, queue_size=8, timeout=300):
+    """Start the worker pool and return the service state used by the handler."""
+    # Workers hold the template snapshot like the batch pool's (see batch._init_worker)
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=batch._init_worker, initargs=(template_snapshot,))
+    # Start every worker now so the first requests do not pay for process start-up
+    for future in [pool.submit(_ping) for _ in range(workers)]:
+        future.result()
+    return {
+        "pool": pool,
+        "slots": threading.BoundedSemaphore(workers + queue_size), # Running plus queued requests
+        "workers": workers,
+        "queue_size": queue_size,
+        "timeout": timeout,
+        "template_version": template_version,
+        "in_flight": 0, # Slots in use: running, queued and timed-out jobs still running
+        "abandoned": 0, # Timed-out jobs still running
+        "lock": threading.Lock(),
+    }
+
+
+class AllocationHandler(BaseHTTPRequestHandler):
+    server_version = "ManMonths/1.0"
+
+    def do_GET(self):
+        if urlparse(self.path).path != "/health":
+            return self._send_json(404, {"error": "Not found"})
+        service = self.server.service
+        return self._send_json(200, {
+            "status": "ok",
+            "template_version": service["template_version"],
+            "workers": service["workers"],
+            "queue_size": service["queue_size"],
+            "in_flight": service["in_flight"],
+            "abandoned": service["abandoned"],
+        })
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path not in ("/allocate", "/workbook"):
+            return self._send_json(404, {"error": "Not found"})
+
+        length = int(self.headers.get("Content-Length") or 0)
+        if length <= 0:
+            return self._send_json(400, {"error": "Empty request body"})
+        if length > MAX_BODY_BYTES:
+            return self._send_json(413, {"error": f"Request body larger than {MAX_BODY_BYTES} bytes"})
+        body = self.rfile.read(length)
+
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        is_json = (self.headers.get("Content-Type") or "").split(";")[0].strip() == "application/json"
+        try:
+            if is_json:
+                body, options = parse_json_rows(json.loads(body))
+                query = {**options, **query}
+            capacity = int(query.get("capacity", engine.MAX_YEARLY_CAPACITY))
+            mode = query.get("mode", engine.GREEDY)
+            ordering = query.get("ordering", engine.SHORTEST_FIRST)
+        except (ValueError, TypeError) as e:
+            return self._send_json(400, {"error": str(e)})
+
+        service = self.server.service
+        if not service["slots"].acquire(blocking=False):
+            return self._send_json(503, {"error": "Too many requests in progress"}, {"Retry-After": "1"})
+        job = {"abandoned": False}
+
+        def release(_future=None):
+            # A job keeps its slot until it ends, even after its request timed out:
+            # a running job cannot be cancelled and still occupies a worker
+            with service["lock"]:
+                service["in_flight"] -= 1
+                if job["abandoned"]:
+                    service["abandoned"] -= 1
+            service["slots"].release()
+
+        with service["lock"]:
+            service["in_flight"] += 1
+        try:
+            future = service["pool"].submit(_run_job, body, is_json, capacity, mode, ordering, url.path == "/workbook")
+        except Exception as e: # e.g. a broken pool
+            release()
+            return self._send_json(500, {"error": f"{type(e).__name__}: {e}"})
+        future.add_done_callback(release)
+
+        try:
+            result = future.result(timeout=service["timeout"])
+        except (ValueError, zipfile.BadZipFile, InvalidFileException) as e: # Bad input, mode or ordering
+            return self._send_json(400, {"error": str(e)})
+        except FutureTimeoutError:
+            with service["lock"]:
+                if not future.done():
+                    job["abandoned"] = True
+                    service["abandoned"] += 1
+            future.cancel() # Only frees the slot now if the job had not started
+            return self._send_json(504, {"error": "Allocation timed out"})
+        except Exception as e:
+            return self._send_json(500, {"error": f"{type(e).__name__}: {e}"})
+
+        if url.path == "/workbook":
+            file_name = quote(f"output{engine.OUTPUT_SUFFIX}") # Headers are latin-1: RFC 5987 encoding
+            return self._send(200, result, XLSX_MIME, {"Content-Disposition": f"attachment; filename*=UTF-8''{file_name}"})
+        return self._send_json(200, result)
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+        self._send(status, body, "application/json; charset=utf-8", headers)
+
+    def _send(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local HTTP service for person-months allocation.")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on (default: localhost only)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port to listen on")
+    parser.add_argument("-j", "--workers", type=int, default=2, help="Worker processes")
+    parser.add_argument("--queue", type=int, default=8, help="Requests allowed to wait for a worker")
+    parser.add_argument("--timeout", type=float, default=300, help="Seconds before a request gives up on its job")
+    parser.add_argument("-t", "--template", default=engine.TEMPLATE_PATH, help="Template workbook (default: bundled 'AM TEST 1.xlsx')")
+    parser.add_argument("--remote-template", action="store_true",
+                        help="Use the app's downloaded template (with cache and offline fallback) instead of --template")
+    args = parser.parse_args(argv)
+
+    if args.remote_template:
+        import template_cache # Only needed (with requests) for the downloaded template
+        template_snapshot, template_version = template_cache.template_snapshot()
+    else:
+        template_snapshot = engine.snapshot_template(args.template)
+        with open(args.template, "rb") as f:
+            template_version = hashlib.sha256(f.read()).hexdigest()
+
+    server = ThreadingHTTPServer((args.host, args.port), AllocationHandler)
+    server.service = new_service(template_snapshot, template_version, args.workers, args.queue, args.timeout)
+    print(f"Serving on http://{args.host}:{server.server_address[1]} with {args.workers} workers", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.service["pool"].shutdown(cancel_futures=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
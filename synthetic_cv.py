@@ -0,0 +1,113 @@
+"""Synthetic ΧΡΟΝΙΚΟ ΔΙΑΣΤΗΜΑ / ΑΝΘΡΩΠΟΜΗΝΕΣ input workbooks for benchmarks."""
+import argparse
+import calendar
+import random
+import sys
+from datetime import date, datetime
+
+import openpyxl
+
+import engine
+
+# --- Period formats the generator can emit ---
+# year: "2019" or "2019-2021"; month: "03/2019 - 11/2020"; day: "15/03/2019 - 30/11/2020";
+# today: "03/2019 - Σήμερα"; excel-date: a date cell (one month); invalid: unparseable text
+DATE_FORMATS = ("year", "month", "day", "today", "excel-date", "invalid")
+DEFAULT_FORMAT_MIX = {"month": 0.6, "day": 0.2, "year": 0.1, "today": 0.05, "excel-date": 0.05}
+
+
+def parse_format_mix(text):
+    # "month=0.6,day=0.4" -> {"month": 0.6, "day": 0.4}
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in DATE_FORMATS:
+            raise ValueError(f"Unknown date format: '{name}'. Expected one of {', '.join(DATE_FORMATS)}.")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def _add_months(year, month, count):
+    index = engine.month_index(year, month) + count
+    return index // 12, index % 12 + 1
+
+
+def _period(fmt, rng, year, month, span):
+    # Period cell value of the given format starting at (year, month) and
+    # covering ``span`` months (approximately, for year and today formats)
+    end_year, end_month = _add_months(year, month, span - 1)
+    if fmt == "year":
+        return str(year) if end_year == year else f"{year}-{end_year}"
+    if fmt == "month":
+        return f"{month:02d}/{year} - {end_month:02d}/{end_year}"
+    if fmt == "day":
+        end_day = rng.randint(1, calendar.monthrange(end_year, end_month)[1])
+        return f"{rng.randint(1, 28):02d}/{month:02d}/{year} - {end_day:02d}/{end_month:02d}/{end_year}"
+    if fmt == "today":
+        today = date.today()
+        start_year, start_month = _add_months(today.year, today.month, -(span - 1))
+        return f"{start_month:02d}/{start_year} - Σήμερα"
+    if fmt == "excel-date":
+        return datetime(year, month, 1)
+    return "ΑΓΝΩΣΤΟ ΔΙΑΣΤΗΜΑ" # invalid
+
+
+def generate_rows(rows, min_span=1, max_span=36, format_mix=None, overlap=0.5,
+                  first_year=1995, last_year=2024, seed=0):
+    """Yield (period, am) pairs for a synthetic CV.
+
+    Span lengths are uniform in [min_span, max_span] months. ``overlap``
+    (0 to 1) narrows the window project starts are drawn from, from the
+    whole first_year..last_year range down to a single year, so higher
+    values make projects compete for the same months. ``format_mix`` maps
+    DATE_FORMATS to relative weights.
+    """
+    rng = random.Random(seed)
+    format_mix = format_mix or DEFAULT_FORMAT_MIX
+    formats, weights = list(format_mix), list(format_mix.values())
+
+    window_years = max(1, round((last_year - first_year + 1) * (1 - overlap)))
+    window_first = engine.month_index(first_year, 1)
+    window_last = engine.month_index(min(first_year + window_years - 1, last_year), 12)
+
+    for _ in range(rows):
+        start = rng.randint(window_first, window_last)
+        span = rng.randint(min_span, max_span)
+        fmt = rng.choices(formats, weights)[0]
+        if fmt == "excel-date":
+            span = 1
+        period = _period(fmt, rng, start // 12, start % 12 + 1, span)
+        yield period, rng.randint(1, span)
+
+
+def write_workbook(target, periods):
+    """Write (period, am) pairs as an input workbook to a path or file-like object."""
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(["A/A", engine.PERIOD_HEADER, engine.AM_HEADER])
+    for number, (period, am) in enumerate(periods, start=1):
+        ws.append([number, period, am])
+    wb.save(target)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic input CV workbook.")
+    parser.add_argument("output", help="Output .xlsx path")
+    parser.add_argument("--rows", type=int, default=100, help="Number of project rows")
+    parser.add_argument("--span", type=int, nargs=2, default=(1, 36), metavar=("MIN", "MAX"), help="Project length in months")
+    parser.add_argument("--mix", type=parse_format_mix, default=None,
+                        help=f"Date format weights, e.g. 'month=0.6,day=0.4' (formats: {', '.join(DATE_FORMATS)})")
+    parser.add_argument("--overlap", type=float, default=0.5, help="Overlap density from 0 (spread out) to 1 (one year)")
+    parser.add_argument("--years", type=int, nargs=2, default=(1995, 2024), metavar=("FIRST", "LAST"), help="Range of start years")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args(argv)
+
+    write_workbook(args.output, generate_rows(args.rows, args.span[0], args.span[1], args.mix, args.overlap,
+                                              args.years[0], args.years[1], args.seed))
+    print(f"Wrote {args.rows} rows to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,349 @@
+"""Organisation-wide allocation: many people against shared project and personal caps.
+
+Each person can give at most one person-month per month (as in the
+single-CV allocation) and at most ``person_yearly_cap`` per year. Each
+named project can additionally be capped per month and per year across
+the whole team. Occupancy and full months/years are int bitsets per
+person and per project over one organisation-wide month axis, so every
+capacity check is a couple of mask operations.
+"""
+import argparse
+import json
+import os # Import os module for path handling
+import re
+import sys
+
+import engine
+
+# --- Team input headers (period and AM headers as in engine) ---
+PERSON_HEADER = "ΟΝΟΜΑΤΕΠΩΝΥΜΟ"
+PROJECT_HEADER = "ΕΡΓΟ" # Optional; rows without a project are not subject to project caps
+TEAM_SHEET = "ΟΜΑΔΑ"
+PROJECTS_SHEET = "ΕΡΓΑ"
+SHEET_TITLE_INVALID = re.compile(r"[\\/*?:\[\]]")
+
+
+# ------------------------------------------------
+# Διαβάζουμε INPUT
+# ------------------------------------------------
+def read_team_input(ws_in):
+    """Parse a team sheet with person, (optional) project, period and AM columns.
+
+    Returns (data, parse_errors) like engine.read_input; every row also
+    carries "person" and "project".
+    """
+    rows = ws_in.iter_rows(values_only=True)
+    headers = {str(value).strip(): c for c, value in enumerate(next(rows, ()))}
+    for header in (PERSON_HEADER, engine.PERIOD_HEADER, engine.AM_HEADER):
+        if header not in headers:
+            raise ValueError(f"Το input πρέπει να έχει στήλες: {PERSON_HEADER}, {engine.PERIOD_HEADER} και {engine.AM_HEADER}")
+    person_col = headers[PERSON_HEADER]
+    project_col = headers.get(PROJECT_HEADER)
+    period_col = headers[engine.PERIOD_HEADER]
+    am_col = headers[engine.AM_HEADER]
+
+    def value(row_values, c):
+        # Read-only sheets may yield short rows when trailing cells are empty
+        return row_values[c] if c is not None and c < len(row_values) else None
+
+    candidates = []
+    fields = {}
+    for r, row_values in enumerate(rows, start=2):
+        person = value(row_values, person_col)
+        period = value(row_values, period_col)
+        am = engine.parse_am(value(row_values, am_col))
+        if not person or not period or am == 0: # Skip rows with no person, period or AMs
+            continue
+        project = value(row_values, project_col)
+        candidates.append((r, period))
+        fields[r] = (str(person).strip(), str(project).strip() if project else None, period, am)
+
+    parsed, parse_errors = engine.parse_periods(candidates)
+    data = []
+    for row_id, (r, start, end) in enumerate(parsed):
+        person, project, period, am = fields[r]
+        project_data = engine.new_project(row_id, r, period, am, start, end) # project_id is unique across the team
+        project_data.update(person=person, project=project)
+        data.append(project_data)
+    return data, parse_errors
+
+
+def read_cv_files(paths):
+    """Read one CV per person (person = file name without extension).
+
+    Returns (data, parse_errors); parse errors carry a "person" key.
+    """
+    data = []
+    parse_errors = []
+    for path in paths:
+        person = os.path.splitext(os.path.basename(path))[0]
+        wb_in = engine.open_input(path, read_only=True)
+        try:
+            rows, years, errors = engine.read_input(wb_in.active)
+        finally:
+            wb_in.close()
+        for project_data in rows:
+            project_data.update(project_id=len(data), person=person, project=None)
+            data.append(project_data)
+        parse_errors.extend(dict(error, person=person) for error in errors)
+    return data, parse_errors
+
+
+def read_project_caps(path):
+    # {"Project": {"monthly": 3, "yearly": 20}, ...}; either cap may be left out
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+# ------------------------------------------------
+# Κατανομή ομάδας
+# ------------------------------------------------
+def _month(base_index, offset):
+    # Month offset on the team's axis -> (year, month)
+    year, month = divmod(base_index + offset, 12)
+    return year, month + 1
+
+
+def allocate_team(data, person_yearly_cap=engine.MAX_YEARLY_CAPACITY, project_caps=None,
+                  project_monthly_cap=None, project_yearly_cap=None, ordering=engine.SHORTEST_FIRST):
+    """Allocate every row of ``data`` against personal and project caps.
+
+    Rows are taken in ``ordering`` (see engine.ORDERINGS) across the whole
+    team, each into its earliest free months. ``project_caps`` maps project
+    names to {"monthly", "yearly"} caps; other named projects get the
+    default ``project_monthly_cap`` / ``project_yearly_cap`` (None means
+    uncapped). Fills each row's "allocated_months", "allocated_am" and
+    "unallocated_am" and returns {"years", "persons", "projects",
+    "month_index"}: per-person allocations shaped like engine.allocate's
+    result, yearly totals per project, and month -> {person: project}.
+    """
+    project_caps = project_caps or {}
+    all_months = sorted({month for project_data in data for month in project_data["months_in_period"]})
+    years = sorted({y for y, m in all_months})
+    first_year = years[0] if years else 0
+    base_index = engine.month_index(first_year, 1)
+    year_count = years[-1] - first_year + 1 if years else 0
+    year_masks = [0xFFF << (12 * year_offset) for year_offset in range(year_count)]
+    all_months_mask = (1 << (year_count * 12)) - 1
+
+    persons = {}
+    projects = {}
+    month_index = {} # Month offset -> {person: project}, reported as (year, month) keys
+
+    def person_state(person):
+        state = persons.get(person)
+        if state is None:
+            state = persons[person] = {"occupied": 0, "blocked": 0 if person_yearly_cap > 0 else all_months_mask,
+                                       "yearly": [0] * year_count, "unallocated_projects": []}
+        return state
+
+    def project_state(project):
+        state = projects.get(project)
+        if state is None:
+            caps = project_caps.get(project, {})
+            monthly_cap = caps.get("monthly", project_monthly_cap)
+            yearly_cap = caps.get("yearly", project_yearly_cap)
+            # A cap of 0 (or less) closes the whole axis up front, like a person cap of 0
+            state = projects[project] = {"full": all_months_mask if monthly_cap is not None and monthly_cap <= 0 else 0,
+                                         "blocked": all_months_mask if yearly_cap is not None and yearly_cap <= 0 else 0,
+                                         "monthly": {}, "yearly": [0] * year_count,
+                                         "monthly_cap": monthly_cap, "yearly_cap": yearly_cap}
+        return state
+
+    for project_data in sorted(data, key=engine.ORDERINGS[ordering]):
+        person = person_state(project_data["person"])
+        # Rows without a project name only answer to the person's caps
+        project = project_state(project_data["project"]) if project_data["project"] else None
+        original_am = project_data["original_am"]
+        months_in_period = project_data["months_in_period"]
+
+        if months_in_period:
+            # month_range is contiguous and chronological, so the span is a bit run
+            first = engine.month_index(*months_in_period[0]) - base_index
+            span = ((1 << len(months_in_period)) - 1) << first
+        else:
+            span = 0
+
+        taken_before = span & person["occupied"]
+        person_blocked = person["blocked"]
+        project_full = project["full"] | project["blocked"] if project else 0
+
+        free = span & ~(person["occupied"] | person["blocked"] | project_full)
+        allocated_offsets = []
+        while free and len(allocated_offsets) < original_am:
+            low = free & -free
+            offset = low.bit_length() - 1
+            year_offset = offset // 12
+            free &= ~low
+
+            allocated_offsets.append(offset)
+            person["occupied"] |= low
+            person["yearly"][year_offset] += 1
+            month_index.setdefault(offset, {})[project_data["person"]] = project_data["project"]
+            if person["yearly"][year_offset] >= person_yearly_cap:
+                person["blocked"] |= year_masks[year_offset]
+                free &= ~year_masks[year_offset]
+
+            if project:
+                month_count = project["monthly"][offset] = project["monthly"].get(offset, 0) + 1
+                project["yearly"][year_offset] += 1
+                if project["monthly_cap"] is not None and month_count >= project["monthly_cap"]:
+                    project["full"] |= low
+                if project["yearly_cap"] is not None and project["yearly"][year_offset] >= project["yearly_cap"]:
+                    project["blocked"] |= year_masks[year_offset]
+                    free &= ~year_masks[year_offset]
+
+        project_data["allocated_months"] = [_month(base_index, offset) for offset in allocated_offsets]
+        project_data["allocated_am"] = len(allocated_offsets)
+        project_data["unallocated_am"] = original_am - len(allocated_offsets)
+
+        if project_data["unallocated_am"] > 0:
+            # Months of the span that were unavailable, by the constraint that held them;
+            # months this row took itself were available to it
+            unavailable = span & ~taken_before & ~sum(1 << offset for offset in allocated_offsets)
+            person_year_months = unavailable & (person_blocked | person["blocked"])
+            project_months = unavailable & (project["full"] | project["blocked"]) & ~person_year_months if project else 0
+            reasons = []
+            if taken_before:
+                reasons.append(f"{bin(taken_before).count('1')} month(s) already allocated to other projects of this person")
+            for year_offset, mask in enumerate(year_masks):
+                if person_year_months & mask:
+                    reasons.append(f"Year {first_year + year_offset} personal capacity reached")
+            if project_months:
+                reasons.append(f"{bin(project_months).count('1')} month(s) at project '{project_data['project']}' capacity")
+            person["unallocated_projects"].append({
+                "period": project_data["period_str"],
+                "project": project_data["project"],
+                "original_am": original_am,
+                "allocated_am": project_data["allocated_am"],
+                "unallocated_am": project_data["unallocated_am"],
+                "reasons": "; ".join(reasons),
+            })
+
+    person_allocations = {}
+    for name, state in persons.items():
+        yearly_am_totals = {y: state["yearly"][y - first_year] for y in years}
+        person_allocations[name] = {
+            "yearly_am_totals": yearly_am_totals,
+            "yearly_overages": {y: total - person_yearly_cap for y, total in yearly_am_totals.items() if total > person_yearly_cap},
+            "unallocated_projects": state["unallocated_projects"],
+            "max_yearly_capacity": person_yearly_cap,
+        }
+
+    return {
+        "years": years,
+        "persons": person_allocations,
+        "projects": {name: {"yearly_am_totals": {y: state["yearly"][y - first_year] for y in years},
+                            "monthly_cap": state["monthly_cap"], "yearly_cap": state["yearly_cap"]}
+                     for name, state in projects.items()},
+        "month_index": {_month(base_index, offset): owners for offset, owners in sorted(month_index.items())},
+    }
+
+
+# ------------------------------------------------
+# Απόδοση ομάδας
+# ------------------------------------------------
+def _sheet_title(name, used):
+    # Excel sheet titles: at most 31 characters, no \ / * ? : [ ] and unique
+    title = SHEET_TITLE_INVALID.sub("_", name)[:31] or "_"
+    number = 1
+    while title in used:
+        number += 1
+        suffix = f" ({number})"
+        title = title[:31 - len(suffix)] + suffix
+    used.add(title)
+    return title
+
+
+def render_team_workbook(template_source, data, result, person_sheets=True):
+    """Build the consolidated team workbook (write-only).
+
+    ΟΜΑΔΑ has one row per person with allocated AM per year, ΕΡΓΑ one row
+    per named project; with ``person_sheets`` every person also gets an
+    ΑΝΑΛΥΣΗ sheet over the years of their own rows.
+    """
+    years = result["years"]
+    template_ws = engine.load_template(template_source).active
+    wb = engine.new_output_workbook(template_ws)
+    styles = engine.new_style_registry(wb)
+    used_titles = {TEAM_SHEET, PROJECTS_SHEET}
+
+    rows_by_person = {}
+    for project_data in data:
+        rows_by_person.setdefault(project_data["person"], []).append(project_data)
+
+    team_ws = wb.create_sheet(title=TEAM_SHEET)
+    team_ws.freeze_panes = "B2"
+    team_ws.append([engine.styled_cell(team_ws, styles, header, "total_label") for header in
+                    [PERSON_HEADER, "ΣΥΝΟΛΟ", "ΜΗ ΚΑΤΑΝΕΜΗΜΕΝΑ"] + years])
+    for person, allocation in sorted(result["persons"].items()):
+        person_rows = rows_by_person.get(person, [])
+        totals = allocation["yearly_am_totals"]
+        team_ws.append([person, sum(totals.values()), sum(p["unallocated_am"] for p in person_rows)] +
+                       [engine.styled_cell(team_ws, styles, totals[y],
+                                           "total_full" if totals[y] >= allocation["max_yearly_capacity"] else
+                                           "total_partial" if totals[y] > 0 else "total_empty")
+                        for y in years])
+
+    projects_ws = wb.create_sheet(title=PROJECTS_SHEET)
+    projects_ws.freeze_panes = "B2"
+    projects_ws.append([engine.styled_cell(projects_ws, styles, header, "total_label") for header in
+                        [PROJECT_HEADER, "ΜΗΝΙΑΙΟ ΟΡΙΟ", "ΕΤΗΣΙΟ ΟΡΙΟ", "ΣΥΝΟΛΟ"] + years])
+    for project, summary in sorted(result["projects"].items()):
+        totals = summary["yearly_am_totals"]
+        projects_ws.append([project, summary["monthly_cap"], summary["yearly_cap"], sum(totals.values())] +
+                           [totals[y] for y in years])
+
+    if person_sheets:
+        layout = engine.template_layout(styles, template_ws)
+        for person in sorted(rows_by_person):
+            person_rows = rows_by_person[person]
+            # Only the person's own years, so sheets stay narrow
+            person_years = sorted({y for project_data in person_rows for y, m in project_data["months_in_period"]})
+            allocation = dict(result["persons"][person])
+            allocation["yearly_am_totals"] = {y: allocation["yearly_am_totals"][y] for y in person_years}
+            ws = wb.create_sheet(title=_sheet_title(person, used_titles))
+            engine.write_analysis_sheet(ws, styles, layout, person_rows, person_years, allocation)
+
+    return wb
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Allocate person-months for a whole team against shared caps.")
+    parser.add_argument("inputs", nargs="+",
+                        help=f"One team workbook ({PERSON_HEADER}, {PROJECT_HEADER}, {engine.PERIOD_HEADER}, {engine.AM_HEADER}) "
+                             "or one CV workbook per person")
+    parser.add_argument("-o", "--output", default="ΚΑΤΑΝΟΜΗ ΟΜΑΔΑΣ.xlsx", help="Output workbook")
+    parser.add_argument("-t", "--template", default=engine.TEMPLATE_PATH, help="Template workbook (default: bundled 'AM TEST 1.xlsx')")
+    parser.add_argument("--capacity", type=int, default=engine.MAX_YEARLY_CAPACITY, help="Maximum person-months per person per year")
+    parser.add_argument("--project-monthly-cap", type=int, default=None, help="Default maximum person-months per project per month")
+    parser.add_argument("--project-yearly-cap", type=int, default=None, help="Default maximum person-months per project per year")
+    parser.add_argument("--project-caps", default=None, help='JSON file: {"project": {"monthly": N, "yearly": N}}')
+    parser.add_argument("--ordering", choices=list(engine.ORDERINGS), default=engine.SHORTEST_FIRST, help="Row prioritization")
+    parser.add_argument("--no-person-sheets", action="store_true", help="Only write the consolidated sheets")
+    args = parser.parse_args(argv)
+
+    if len(args.inputs) == 1:
+        wb_in = engine.open_input(args.inputs[0], read_only=True)
+        try:
+            data, parse_errors = read_team_input(wb_in.active)
+        finally:
+            wb_in.close()
+    else:
+        data, parse_errors = read_cv_files(args.inputs)
+
+    for error in parse_errors:
+        print(f"  {error.get('person', args.inputs[0])}: {engine.format_parse_error(error)}", file=sys.stderr)
+
+    project_caps = read_project_caps(args.project_caps) if args.project_caps else None
+    result = allocate_team(data, args.capacity, project_caps, args.project_monthly_cap, args.project_yearly_cap, args.ordering)
+
+    wb = render_team_workbook(args.template, data, result, not args.no_person_sheets)
+    wb.save(args.output)
+    print(f"{len(result['persons'])} people, {len(data)} rows: allocated AM {sum(p['allocated_am'] for p in data)}, "
+          f"unallocated AM {sum(p['unallocated_am'] for p in data)} -> {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
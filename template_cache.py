@@ -0,0 +1,146 @@
+import hashlib
+import io # Import io to handle byte streams
+import json
+import os # Import os module for cache paths
+import threading
+import time
+import zipfile # Import zipfile to reject downloads that are not XLSX files
+
+import openpyxl
+import requests # Import requests to download files from URLs
+from openpyxl.utils.exceptions import InvalidFileException
+
+import engine
+
+# --- Template source and local cache ---
+TEMPLATE_URL = "https://raw.githubusercontent.com/dimitrisaronis1-dev/MANMONTHS-6/main/AM%20TEST%201.xlsx"
+CACHE_DIR = os.environ.get("AM_TEMPLATE_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "manmonths"))
+CACHE_FILE = os.path.join(CACHE_DIR, "template.xlsx")
+CACHE_META_FILE = os.path.join(CACHE_DIR, "template.json")
+REVALIDATE_SECONDS = 3600 # How long an in-memory template is trusted before a conditional GET
+REQUEST_TIMEOUT = 10 # Seconds
+
+# In-process parsed template shared by all Streamlit sessions
+_lock = threading.Lock()
+_memory = {"snapshot": None, "version": None, "source": None, "checked_at": 0.0}
+
+
+def _is_template(content):
+    # A 200 response may still be a captive portal or an HTML error page:
+    # only a readable workbook is cached or used
+    if not zipfile.is_zipfile(io.BytesIO(content)):
+        return False
+    try:
+        openpyxl.load_workbook(io.BytesIO(content), read_only=True).close()
+    except (zipfile.BadZipFile, InvalidFileException, KeyError, ValueError, OSError):
+        return False
+    return True
+
+
+def _read_cache():
+    # Return (content, meta) from the on-disk cache, or (None, {}) if missing or unreadable
+    try:
+        with open(CACHE_FILE, "rb") as f:
+            content = f.read()
+    except OSError:
+        return None, {}
+    if not _is_template(content):
+        return None, {} # e.g. a page cached before downloads were checked
+    try:
+        with open(CACHE_META_FILE, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        meta = {}
+    return content, meta
+
+
+def _write_cache(content, meta):
+    # Write atomically so concurrent processes never read a half-written template
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_file = CACHE_FILE + f".{os.getpid()}.tmp"
+        with open(tmp_file, "wb") as f:
+            f.write(content)
+        os.replace(tmp_file, CACHE_FILE)
+        tmp_meta = CACHE_META_FILE + f".{os.getpid()}.tmp"
+        with open(tmp_meta, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp_meta, CACHE_META_FILE)
+    except OSError:
+        pass # A read-only filesystem only costs us the disk cache
+
+
+def fetch_template_bytes(url=TEMPLATE_URL):
+    """Return (content, source) for the template.
+
+    Revalidates the on-disk copy with a conditional GET. Falls back to the
+    cached copy and then to the bundled 'AM TEST 1.xlsx' when the network
+    is unavailable or returns something that is not a workbook. ``source``
+    is "network", "cache" or "bundled".
+    """
+    content, meta = _read_cache()
+
+    headers = {}
+    if content is not None and meta.get("url") == url:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    try:
+        response = requests.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+        if response.status_code == 304 and content is not None:
+            return content, "cache"
+        response.raise_for_status() # Raise an exception for HTTP errors
+        if _is_template(response.content):
+            _write_cache(response.content, {
+                "url": url,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+            })
+            return response.content, "network"
+    except requests.exceptions.RequestException:
+        pass
+    if content is not None:
+        return content, "cache"
+
+    with open(engine.TEMPLATE_PATH, "rb") as f:
+        return f.read(), "bundled"
+
+
+def _current_snapshot(url):
+    # Return (snapshot, version), revalidating at most every REVALIDATE_SECONDS
+    with _lock:
+        now = time.monotonic()
+        if _memory["snapshot"] is None or now - _memory["checked_at"] > REVALIDATE_SECONDS:
+            content, source = fetch_template_bytes(url)
+            version = hashlib.sha256(content).hexdigest()
+            if version != _memory["version"]:
+                _memory["snapshot"] = engine.snapshot_template(io.BytesIO(content))
+                _memory["version"] = version
+            _memory["source"] = source
+            _memory["checked_at"] = now
+        return _memory["snapshot"], _memory["version"]
+
+
+def template_version(url=TEMPLATE_URL):
+    """Return the SHA-256 of the current template without cloning it."""
+    return _current_snapshot(url)[1]
+
+
+def template_snapshot(url=TEMPLATE_URL):
+    """Return (snapshot, version): the pickled, cleared template and its SHA-256.
+
+    For handing the warm template to worker processes (see engine.clone_template).
+    """
+    return _current_snapshot(url)
+
+
+def get_template(url=TEMPLATE_URL):
+    """Return (workbook, version) with a fresh clone of the parsed template.
+
+    Warm calls clone the in-memory snapshot without touching the network or
+    re-parsing the XLSX. ``version`` is the SHA-256 of the template bytes.
+    """
+    snapshot, version = _current_snapshot(url)
+    return engine.clone_template(snapshot), version
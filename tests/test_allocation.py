@@ -0,0 +1,198 @@
+import random
+
+import pytest
+
+import engine
+import flow
+import synthetic_cv
+
+
+def random_projects(seed, rows=60):
+    # Overlapping synthetic projects, so months and yearly capacity are contended
+    rng = random.Random(seed)
+    candidates = [(r, period, am) for r, (period, am) in
+                  enumerate(synthetic_cv.generate_rows(rows, max_span=24, overlap=rng.random(), seed=seed,
+                                                       first_year=2010, last_year=2016), start=2)]
+    data, years, parse_errors = engine.project_rows(candidates)
+    assert parse_errors == []
+    return candidates, data, years
+
+
+# ------------------------------------------------
+# Greedy
+# ------------------------------------------------
+def reference_greedy(data, years, max_yearly_capacity, ordering):
+    # The original month-by-month greedy over (year, month) dicts
+    data = sorted(data, key=engine.ORDERINGS[ordering])
+    yearly_am_totals = {y: 0 for y in years}
+    month_allocation_status = {}
+    results = []
+    for project_data in data:
+        allocated_months = []
+        reasons = []
+        for (y, m) in project_data["months_in_period"]:
+            if len(allocated_months) >= project_data["original_am"]:
+                break
+            if yearly_am_totals[y] >= max_yearly_capacity:
+                if f"Year {y} capacity reached" not in reasons:
+                    reasons.append(f"Year {y} capacity reached")
+                continue
+            if (y, m) in month_allocation_status:
+                reason = f"Month {m}/{y} already allocated by Project {month_allocation_status[(y, m)]}"
+                if reason not in reasons:
+                    reasons.append(reason)
+                continue
+            yearly_am_totals[y] += 1
+            month_allocation_status[(y, m)] = project_data["project_id"]
+            allocated_months.append((y, m))
+        unallocated = project_data["original_am"] - len(allocated_months)
+        results.append((project_data["project_id"], allocated_months, "; ".join(reasons) if unallocated > 0 else None))
+    return results, yearly_am_totals
+
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("capacity", [0, 4, engine.MAX_YEARLY_CAPACITY])
+def test_greedy_matches_reference(seed, capacity):
+    _, data, years = random_projects(seed)
+    ordering = list(engine.ORDERINGS)[seed % len(engine.ORDERINGS)]
+    expected, expected_totals = reference_greedy(data, years, capacity, ordering)
+
+    allocation = engine.allocate_greedy(data, years, capacity, ordering=ordering)
+
+    reasons = iter(project["reasons"] for project in allocation["unallocated_projects"])
+    assert [(p["project_id"], p["allocated_months"], next(reasons) if p["unallocated_am"] > 0 else None)
+            for p in data] == expected
+    assert allocation["yearly_am_totals"] == expected_totals
+
+
+# ------------------------------------------------
+# Max flow
+# ------------------------------------------------
+def ford_fulkerson(capacities, source, sink):
+    # Breadth-first augmenting paths over a {u: {v: capacity}} residual dict
+    residual = {u: dict(edges) for u, edges in capacities.items()}
+    for u, edges in capacities.items():
+        for v in edges:
+            residual.setdefault(v, {}).setdefault(u, 0)
+    total = 0
+    while True:
+        parent = {source: None}
+        queue = [source]
+        for u in queue:
+            for v, capacity in residual[u].items():
+                if capacity > 0 and v not in parent:
+                    parent[v] = u
+                    queue.append(v)
+        if sink not in parent:
+            return total
+        path = []
+        v = sink
+        while parent[v] is not None:
+            path.append((parent[v], v))
+            v = parent[v]
+        pushed = min(residual[u][v] for u, v in path)
+        for u, v in path:
+            residual[u][v] -= pushed
+            residual[v][u] += pushed
+        total += pushed
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_dinic_matches_ford_fulkerson(seed):
+    rng = random.Random(seed)
+    node_count = rng.randint(2, 30)
+    graph = flow.new_graph(node_count)
+    capacities = {u: {} for u in range(node_count)}
+    for _ in range(rng.randint(0, node_count * 4)):
+        u, v = rng.randrange(node_count), rng.randrange(node_count)
+        if u == v:
+            continue
+        capacity = rng.randint(0, 10)
+        flow.add_edge(graph, u, v, capacity)
+        capacities[u][v] = capacities[u].get(v, 0) + capacity
+
+    assert flow.max_flow(graph, 0, node_count - 1) == ford_fulkerson(capacities, 0, node_count - 1)
+
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("capacity", [0, 4, engine.MAX_YEARLY_CAPACITY])
+def test_max_flow_allocation_is_maximum(seed, capacity):
+    _, data, years = random_projects(seed)
+    # source -> project (AM) -> its months (1) -> year (capacity) -> sink
+    network = {"source": {}, "sink": {}}
+    for project_data in data:
+        network["source"][project_data["project_id"]] = max(project_data["original_am"], 0)
+        network[project_data["project_id"]] = {ym: 1 for ym in project_data["months_in_period"]}
+    for y in years:
+        for m in range(1, 13):
+            network[(y, m)] = {y: 1}
+        network[y] = {"sink": capacity}
+
+    allocation = engine.allocate(data, years, capacity, mode=engine.MAX_FLOW)
+
+    # Feasible: own months only, one project per month, within AM and yearly capacity
+    owners = {}
+    for project_data in data:
+        assert set(project_data["allocated_months"]) <= set(project_data["months_in_period"])
+        assert project_data["allocated_am"] == len(project_data["allocated_months"]) <= max(project_data["original_am"], 0)
+        for ym in project_data["allocated_months"]:
+            assert owners.setdefault(ym, project_data["project_id"]) == project_data["project_id"]
+    assert all(total <= capacity for total in allocation["yearly_am_totals"].values())
+    # Maximum: as many person-months as the reference max flow
+    assert sum(p["allocated_am"] for p in data) == ford_fulkerson(network, "source", "sink")
+    assert sum(allocation["yearly_am_totals"].values()) == len(owners)
+
+
+# ------------------------------------------------
+# Incremental edits
+# ------------------------------------------------
+def full_run(candidates, max_yearly_capacity, ordering):
+    data, years, parse_errors = engine.project_rows(candidates)
+    allocation = engine.allocate(data, years, max_yearly_capacity, ordering=ordering)
+    return data, years, allocation, parse_errors
+
+def comparable(result):
+    data, years, allocation, parse_errors = result
+    return ([(p["row"], p["project_id"], p["allocated_months"], p["allocated_am"], p["unallocated_am"]) for p in data],
+            years, allocation, parse_errors)
+
+
+@pytest.mark.parametrize("seed", range(10))
+@pytest.mark.parametrize("capacity", [0, 4, engine.MAX_YEARLY_CAPACITY])
+def test_incremental_edits_match_full_runs(seed, capacity):
+    rng = random.Random(seed)
+    candidates, _, _ = random_projects(seed)
+    ordering = list(engine.ORDERINGS)[seed % len(engine.ORDERINGS)]
+    rows = {r: (period, am) for r, period, am in candidates}
+    state = engine.new_allocation_state(candidates, capacity, ordering)
+    assert comparable(engine.allocation_result(state)) == comparable(full_run(candidates, capacity, ordering))
+
+    for step in range(15):
+        changes = {}
+        for _ in range(rng.choice([1, 1, 3])):
+            r = rng.choice(list(rows) + [len(candidates) + 2 + rng.randint(0, 3)]) # Existing or new rows
+            if rng.random() < 0.15:
+                changes[r] = (None, 0) # Cleared row
+                continue
+            period, am = next(synthetic_cv.generate_rows(1, max_span=24, seed=rng.randrange(10 ** 6),
+                                                         first_year=2008, last_year=2018))
+            if rng.random() < 0.2:
+                period = rng.choice(["ΑΓΝΩΣΤΟ", "2030", "1990-1991", "07/2021"]) # Parse errors and axis growth
+            changes[r] = (period, rng.choice([am, am, "x", 0, 3]))
+
+        engine.edit_rows(state, changes)
+        for r, (period, am) in changes.items():
+            am = engine.parse_am(am)
+            if period and am != 0:
+                rows[r] = (period, am)
+            else:
+                rows.pop(r, None)
+
+        expected = full_run(sorted((r, period, am) for r, (period, am) in rows.items()), capacity, ordering)
+        assert comparable(engine.allocation_result(state)) == comparable(expected), step
+
+
+def test_edit_input_sheet_clears_cells():
+    ws_in = engine.rows_worksheet([("01/2020 - 12/2020", 5), ("2021", 3)])
+    engine.edit_input_sheet(ws_in, {2: (None, None), 3: ("2022", 4)})
+    assert [[cell.value for cell in row] for row in ws_in.iter_rows(min_row=2)] == [[None, None], ["2022", 4]]
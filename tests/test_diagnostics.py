@@ -0,0 +1,27 @@
+import tracemalloc
+
+import diagnostics
+
+
+def test_overlapping_reports_share_memory_tracing():
+    first = diagnostics.new_report(True, session="first")
+    second = diagnostics.new_report(True, session="second")
+    assert tracemalloc.is_tracing()
+
+    diagnostics.finish(first)
+    assert tracemalloc.is_tracing() # second is still measuring
+    with diagnostics.phase(second, "work"):
+        list(range(1000))
+    diagnostics.finish(second)
+    diagnostics.finish(second) # Finishing twice does not release twice
+    assert not tracemalloc.is_tracing()
+    assert [record["phase"] for record in second["phases"]] == ["work"]
+
+
+def test_tracing_started_elsewhere_is_left_running():
+    tracemalloc.start()
+    try:
+        diagnostics.finish(diagnostics.new_report(True))
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
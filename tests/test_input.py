@@ -0,0 +1,135 @@
+import io
+import re
+import zipfile
+from datetime import date, datetime
+
+import openpyxl
+import pytest
+
+import engine
+
+
+def saved_input(rows, dimension=None):
+    # XLSX bytes of an input sheet; dimension overrides the stored <dimension ref>
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append([engine.PERIOD_HEADER, engine.AM_HEADER])
+    for row in rows:
+        ws.append(row)
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    if dimension is None:
+        return buffer.getvalue()
+
+    rewritten = io.BytesIO()
+    with zipfile.ZipFile(io.BytesIO(buffer.getvalue())) as src, zipfile.ZipFile(rewritten, "w") as dst:
+        for item in src.infolist():
+            content = src.read(item.filename)
+            if item.filename == "xl/worksheets/sheet1.xml":
+                content = re.sub(rb'<dimension ref="[^"]*"/>', f'<dimension ref="{dimension}"/>'.encode(), content)
+            dst.writestr(item, content)
+    return rewritten.getvalue()
+
+
+# ------------------------------------------------
+# open_input
+# ------------------------------------------------
+@pytest.mark.parametrize("dimension", ["A1", "A1:B2"])
+def test_read_only_input_ignores_wrong_dimension(dimension):
+    rows = [("01/2020-12/2020", 3), ("01/2021-06/2021", 2), ("03/2022-04/2022", 1)]
+    wb_in = engine.open_input(io.BytesIO(saved_input(rows, dimension)), read_only=True)
+    try:
+        assert [(period, am) for _, period, am in engine.input_rows(wb_in.active)] == rows
+    finally:
+        wb_in.close()
+
+
+# ------------------------------------------------
+# Periods
+# ------------------------------------------------
+@pytest.mark.parametrize("period, start, end", [
+    ("2022", (2022, 1, 1), (2022, 12, 31)),
+    (" 2022 ", (2022, 1, 1), (2022, 12, 31)),
+    (2022, (2022, 1, 1), (2022, 12, 31)),
+    (2022.0, (2022, 1, 1), (2022, 12, 31)), # Year typed into a numeric cell
+    ("2019-2020", (2019, 1, 1), (2020, 12, 31)),
+    ("2019–2020", (2019, 1, 1), (2020, 12, 31)), # En dash
+    ("2019—2020", (2019, 1, 1), (2020, 12, 31)), # Em dash
+    ("3/2019-5/2020", (2019, 3, 1), (2020, 5, 31)),
+    ("03/2019 - 05/2020", (2019, 3, 1), (2020, 5, 31)),
+    ("2/2020-2/2020", (2020, 2, 1), (2020, 2, 29)),
+    ("2/2021-2/2021", (2021, 2, 1), (2021, 2, 28)),
+    ("15/3/2019-20/04/2020", (2019, 3, 15), (2020, 4, 20)),
+    ("2018-6/2019", (2018, 1, 1), (2019, 6, 30)),
+    ("1/1/2018-2019", (2018, 1, 1), (2019, 12, 31)),
+    (datetime(2019, 3, 15, 10, 30), (2019, 3, 1), (2019, 3, 31)), # Date cell: its whole month
+    (date(2020, 2, 10), (2020, 2, 1), (2020, 2, 29)),
+])
+def test_parse_period_formats(period, start, end):
+    assert engine.parse_period(period) == (datetime(*start), datetime(*end))
+
+@pytest.mark.parametrize("period", ["01/2020-Σήμερα", "01/2020 - σήμερα", "2020-Σήμερα", "1/1/2020-simera"])
+def test_today_as_end(period):
+    start, end = engine.parse_period(period)
+    assert (start, end.date()) == (datetime(2020, 1, 1), date.today())
+
+@pytest.mark.parametrize("period, message", [
+    ("Σήμερα-12/2020", "Unsupported date format: 'Σήμερα'"), # Only an end date may be today
+    ("13/2020-12/2021", "Invalid date: '13/2020'"),
+    ("0/2020-12/2021", "Invalid date: '0/2020'"),
+    ("31/2/2020-2021", "Invalid date: '31/2/2020'"),
+    ("29/2/2021-2022", "Invalid date: '29/2/2021'"),
+    ("1/13/2020-2021", "Invalid date: '1/13/2020'"),
+    ("32/01/2020-2021", "Invalid date: '32/01/2020'"),
+    ("01.2020-02.2020", "Unsupported date format: '01.2020'"),
+    ("2020-2021-2022", "Invalid period format: '2020-2021-2022'"),
+    ("abc", "Invalid period format: 'abc'"),
+    (2020.5, "Invalid period format: '2020.5'"),
+])
+def test_parse_period_rejects(period, message):
+    with pytest.raises(ValueError, match=re.escape(message)):
+        engine.parse_period(period)
+
+@pytest.mark.parametrize("text, is_start, expected", [
+    ("2020", True, (2020, 1, 1)),
+    ("2020", False, (2020, 12, 31)),
+    ("4/2020", True, (2020, 4, 1)),
+    ("4/2020", False, (2020, 4, 30)),
+    ("7/4/2020", True, (2020, 4, 7)),
+    ("7/4/2020", False, (2020, 4, 7)),
+    (date(2020, 4, 7), True, (2020, 4, 7)),
+])
+def test_parse_date(text, is_start, expected):
+    assert engine.parse_date(text, is_start) == datetime(*expected)
+
+def test_today_period_expires_with_the_day(monkeypatch):
+    # Memoized 'Σήμερα' periods are keyed by the date, so they end today, not on the day first parsed
+    days = iter([date(2030, 5, 1), date(2030, 5, 2)])
+
+    class FakeDate(date):
+        @classmethod
+        def today(cls):
+            return current
+
+    class FakeDatetime(datetime):
+        @classmethod
+        def today(cls):
+            return datetime(current.year, current.month, current.day)
+
+    monkeypatch.setattr(engine, "date", FakeDate)
+    monkeypatch.setattr(engine, "datetime", FakeDatetime)
+    ends = []
+    for current in days:
+        ends.append(engine.parse_period("01/2030-Σήμερα")[1])
+    assert ends == [datetime(2030, 5, 1), datetime(2030, 5, 2)]
+
+def test_parse_periods_reports_every_error():
+    parsed, errors = engine.parse_periods([(2, "2020"), (3, "13/2020-2021"), (4, datetime(2021, 6, 3)), (5, "x-y-z")])
+
+    assert parsed == [(2, datetime(2020, 1, 1), datetime(2020, 12, 31)),
+                      (4, datetime(2021, 6, 1), datetime(2021, 6, 30))]
+    assert errors == [
+        {"row": 3, "period": "13/2020-2021", "error": "Invalid date: '13/2020'."},
+        {"row": 5, "period": "x-y-z", "error": "Invalid period format: 'x-y-z'. Expected 'YYYY' or 'START_DATE-END_DATE'."},
+    ]
+    assert engine.format_parse_error(errors[0]) == "Skipping row 3 due to period parsing error: Invalid date: '13/2020'."
@@ -0,0 +1,78 @@
+import io
+
+import openpyxl
+import pytest
+
+import engine
+import synthetic_cv
+
+
+def input_sheet(rows, seed):
+    # Synthetic CV sheet with the engine's headers
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append([engine.PERIOD_HEADER, engine.AM_HEADER])
+    for period, am in synthetic_cv.generate_rows(rows, seed=seed):
+        ws.append([period, am])
+    return ws
+
+def snapshot(wb):
+    # What a reader of the saved file sees: values, resolved styles, merges,
+    # freeze panes and per-column widths of every sheet
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    buffer.seek(0)
+    saved = openpyxl.load_workbook(buffer)
+    cells = {}
+    for ws in saved:
+        for row in ws.iter_rows():
+            for cell in row:
+                if cell.value is None and not cell.has_style:
+                    continue
+                cells[(ws.title, cell.coordinate)] = (cell.value, repr(cell.font), repr(cell.fill), repr(cell.border),
+                                                      repr(cell.alignment), cell.number_format)
+        cells[(ws.title, "merged")] = sorted(map(str, ws.merged_cells.ranges))
+        cells[(ws.title, "freeze")] = ws.freeze_panes
+        cells[(ws.title, "widths")] = sorted({(c, dim.width) for dim in ws.column_dimensions.values() if dim.width
+                                              for c in range(dim.min or 1, (dim.max or dim.min or 1) + 1)})
+    cells["sheets"] = saved.sheetnames
+    cells["theme"] = saved.loaded_theme
+    cells["custom_doc_props"] = [(prop.name, prop.value) for prop in saved.custom_doc_props]
+    return cells
+
+
+@pytest.mark.parametrize("rows", [0, 1, 3, 12, 40])
+def test_streaming_matches_template_renderer(rows):
+    ws_in = input_sheet(rows, seed=rows)
+    data, years, _ = engine.read_input(ws_in)
+    allocation = engine.allocate(data, years)
+
+    expected = snapshot(engine.render_workbook(engine.TEMPLATE_PATH, ws_in, data, years, allocation))
+    actual = snapshot(engine.render_workbook_streaming(engine.TEMPLATE_PATH, ws_in, data, years, allocation))
+
+    assert [key for key in expected.keys() | actual.keys() if expected.get(key) != actual.get(key)] == []
+    assert actual[("ΑΝΑΛΥΣΗ", "A6")][0] == engine.MATCH_FORMULA
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_read_only_input_with_blank_cells(streaming):
+    # Read-only sheets yield EmptyCell for blank cells, e.g. a row without a comment
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append([engine.PERIOD_HEADER, engine.AM_HEADER, "Σχόλια"])
+    ws.append(["01/2020-12/2020", 3, "με σχόλιο"])
+    ws.append(["01/2021-06/2021", 2])
+    buffer = io.BytesIO()
+    wb.save(buffer)
+
+    wb_in = engine.open_input(io.BytesIO(buffer.getvalue()), read_only=True)
+    try:
+        data, years, _ = engine.read_input(wb_in.active)
+        allocation = engine.allocate(data, years)
+        wb_out = engine.render(engine.TEMPLATE_PATH, wb_in.active, data, years, allocation, streaming)
+        output = snapshot(wb_out)
+    finally:
+        wb_in.close()
+
+    assert output[("CV", "C2")][0] == "με σχόλιο"
+    assert ("CV", "C3") not in output
@@ -0,0 +1,104 @@
+import io
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import openpyxl
+import pytest
+
+import engine
+import service
+import synthetic_cv
+
+ROWS = [["01/2020-12/2020", 3], ["01/2021-06/2021", 2]]
+
+
+def start_server(**options):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), service.AllocationHandler)
+    server.service = service.new_service(engine.snapshot_template(engine.TEMPLATE_PATH), "test-version", **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def stop_server(server):
+    server.shutdown()
+    server.server_close()
+    server.service["pool"].shutdown(cancel_futures=True)
+
+def request(server, path, body=None, content_type="application/json"):
+    # (status, content type, body) of a GET (no body) or POST
+    url = f"http://127.0.0.1:{server.server_address[1]}{path}"
+    data = json.dumps(body).encode() if content_type == "application/json" and body is not None else body
+    req = urllib.request.Request(url, data=data, headers={"Content-Type": content_type} if data is not None else {})
+    try:
+        with urllib.request.urlopen(req, timeout=60) as response:
+            return response.status, response.headers["Content-Type"], response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers["Content-Type"], e.read()
+
+def health(server):
+    return json.loads(request(server, "/health")[2])
+
+
+@pytest.fixture(scope="module")
+def server():
+    server = start_server(workers=1, queue_size=2, timeout=60)
+    yield server
+    stop_server(server)
+
+
+def test_allocate_json(server):
+    status, content_type, body = request(server, "/allocate", {"rows": ROWS, "capacity": 11})
+
+    assert status == 200 and content_type.startswith("application/json")
+    result = json.loads(body)
+    assert (result["allocated_am"], result["unallocated_am"], result["max_yearly_capacity"]) == (5, 0, 11)
+    assert health(server)["in_flight"] == 0
+
+def test_workbook_from_xlsx_upload(server):
+    wb = openpyxl.Workbook()
+    wb.active.append([engine.PERIOD_HEADER, engine.AM_HEADER])
+    for row in ROWS:
+        wb.active.append(row)
+    upload = io.BytesIO()
+    wb.save(upload)
+
+    status, content_type, body = request(server, "/workbook", upload.getvalue(), service.XLSX_MIME)
+
+    assert status == 200 and content_type == service.XLSX_MIME
+    assert openpyxl.load_workbook(io.BytesIO(body)).sheetnames == ["CV", "ΑΝΑΛΥΣΗ"]
+
+@pytest.mark.parametrize("body, content_type", [
+    ({"rows": [["01/2020-12/2020"]]}, "application/json"), # Row without AMs
+    ({"rows": ROWS, "mode": "unknown"}, "application/json"),
+    ({"rows": ROWS, "capacity": "many"}, "application/json"),
+    (b"not a workbook", "application/octet-stream"),
+])
+def test_bad_input(server, body, content_type):
+    status, _, response = request(server, "/allocate", body, content_type)
+
+    assert status == 400 and "error" in json.loads(response)
+    assert health(server)["in_flight"] == 0
+
+
+def test_timed_out_job_keeps_its_slot():
+    # One worker and no queue: a timed-out job holds the only slot until it ends
+    server = start_server(workers=1, queue_size=0, timeout=0.05)
+    try:
+        slow_rows = [[period if isinstance(period, str) else f"{period:%m/%Y}", am]
+                     for period, am in synthetic_cv.generate_rows(2000, seed=1)]
+        assert request(server, "/workbook", {"rows": slow_rows})[0] == 504
+        counters = health(server)
+        assert (counters["in_flight"], counters["abandoned"]) == (1, 1)
+
+        status, _, body = request(server, "/allocate", {"rows": ROWS})
+        assert status == 503 and "error" in json.loads(body)
+
+        deadline = time.monotonic() + 60
+        while health(server)["in_flight"] and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert (health(server)["in_flight"], health(server)["abandoned"]) == (0, 0)
+    finally:
+        stop_server(server)
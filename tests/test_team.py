@@ -0,0 +1,57 @@
+import io
+
+import openpyxl
+
+import engine
+import team
+
+
+def team_sheet(rows):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append([team.PERSON_HEADER, team.PROJECT_HEADER, engine.PERIOD_HEADER, engine.AM_HEADER])
+    for row in rows:
+        ws.append(list(row))
+    return ws
+
+
+def test_am_cells_parse_like_single_cv_inputs():
+    values = [5, 2.0, "3", "n/a", None, ""]
+    data, _ = team.read_team_input(team_sheet([("Person A", None, "2020", am) for am in values]))
+
+    assert [(p["row"], p["original_am"]) for p in data] == [
+        (r, engine.parse_am(am)) for r, am in enumerate(values, start=2) if engine.parse_am(am)]
+
+
+def test_zero_project_caps_block_every_month():
+    data, parse_errors = team.read_team_input(team_sheet([
+        ("Person A", "Monthly", "2020", 5),
+        ("Person A", "Yearly", "2021", 5),
+        ("Person B", "Open", "2020", 5),
+    ]))
+    assert parse_errors == []
+
+    result = team.allocate_team(data, project_caps={"Monthly": {"monthly": 0}, "Yearly": {"yearly": 0}})
+
+    assert {p["project"]: p["allocated_am"] for p in data} == {"Monthly": 0, "Yearly": 0, "Open": 5}
+    assert result["projects"]["Monthly"]["yearly_am_totals"] == {2020: 0, 2021: 0}
+
+
+def test_capacity_reason_counts_only_unavailable_months():
+    data, _ = team.read_team_input(team_sheet([("Person A", "P", "2020", 12)]))
+    result = team.allocate_team(data, project_caps={"P": {"yearly": 5}})
+
+    unallocated = result["persons"]["Person A"]["unallocated_projects"]
+    assert [(p["allocated_am"], p["reasons"]) for p in unallocated] == [(5, "7 month(s) at project 'P' capacity")]
+
+
+def test_person_sheets_render():
+    data, _ = team.read_team_input(team_sheet([(f"Person {p}", None, "01/2019 - 12/2021", 20) for p in range(3)]))
+    result = team.allocate_team(data)
+
+    buffer = io.BytesIO()
+    team.render_team_workbook(engine.TEMPLATE_PATH, data, result).save(buffer)
+    wb = openpyxl.load_workbook(buffer)
+
+    assert wb["Person 1"]["E6"].value == "X"
+    assert wb.sheetnames == [team.TEAM_SHEET, team.PROJECTS_SHEET, "Person 0", "Person 1", "Person 2"]
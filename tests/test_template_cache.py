@@ -0,0 +1,58 @@
+import os
+
+import pytest
+
+import engine
+import template_cache
+
+
+class Response:
+    def __init__(self, status_code, content=b"", headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        pass
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(template_cache, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(template_cache, "CACHE_FILE", str(tmp_path / "template.xlsx"))
+    monkeypatch.setattr(template_cache, "CACHE_META_FILE", str(tmp_path / "template.json"))
+    return tmp_path
+
+
+def serve(monkeypatch, response):
+    monkeypatch.setattr(template_cache.requests, "get", lambda url, headers, timeout: response)
+
+
+def test_html_page_is_not_cached(cache_dir, monkeypatch):
+    serve(monkeypatch, Response(200, b"<html>Sign in to the network</html>", {"ETag": '"portal"'}))
+
+    content, source = template_cache.fetch_template_bytes()
+
+    assert source == "bundled"
+    with open(engine.TEMPLATE_PATH, "rb") as f:
+        assert content == f.read()
+    assert not os.path.exists(template_cache.CACHE_FILE)
+
+
+def test_html_page_keeps_cached_template(cache_dir, monkeypatch):
+    with open(engine.TEMPLATE_PATH, "rb") as f:
+        template = f.read()
+    serve(monkeypatch, Response(200, template, {"ETag": '"v1"'}))
+    assert template_cache.fetch_template_bytes() == (template, "network")
+
+    serve(monkeypatch, Response(200, b"<html>Error</html>"))
+    assert template_cache.fetch_template_bytes() == (template, "cache")
+
+
+def test_poisoned_cache_is_not_revalidated(cache_dir, monkeypatch):
+    # A page cached by an earlier version is ignored, even if the server answers 304
+    (cache_dir / "template.xlsx").write_bytes(b"<html>Sign in</html>")
+    (cache_dir / "template.json").write_text('{"url": "%s", "etag": "\\"portal\\""}' % template_cache.TEMPLATE_URL)
+    serve(monkeypatch, Response(304))
+
+    assert template_cache.fetch_template_bytes()[1] == "bundled"